@@ -4,3 +4,71 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.core.checks import Tags, register
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import (
+            m2m_changed,
+            post_delete,
+            post_save,
+            pre_save,
+        )
+
+        from rest_framework.authtoken.models import Token
+
+        from recipes.models import Ingredient, Recipe, Tag, User
+        from . import authentication, checks, performance, response_cache
+        from .ingredient_index import bump_index_version
+        from .pdf import register_fonts
+
+        register_fonts()
+        register(checks.check_shared_cache, Tags.caches)
+
+        connection_created.connect(
+            performance.install_query_recorder,
+            dispatch_uid='performance_query_recorder',
+        )
+
+        for signal in (post_save, post_delete):
+            signal.connect(
+                bump_index_version,
+                sender=Ingredient,
+                dispatch_uid=f'ingredient_index_{signal is post_save}',
+            )
+
+        receivers = (
+            (Recipe, response_cache.recipe_saved),
+            (Tag, response_cache.tag_saved),
+            (Ingredient, response_cache.ingredient_saved),
+        )
+        for sender, receiver in receivers:
+            for signal in (post_save, post_delete):
+                signal.connect(
+                    receiver,
+                    sender=sender,
+                    dispatch_uid=(
+                        f'response_cache_{sender.__name__}_'
+                        f'{signal is post_save}'
+                    ),
+                )
+        pre_save.connect(
+            response_cache.user_saving,
+            sender=User,
+            dispatch_uid='response_cache_user',
+        )
+        post_delete.connect(
+            authentication.token_deleted,
+            sender=Token,
+            dispatch_uid='token_cache_token',
+        )
+        post_save.connect(
+            authentication.user_saved,
+            sender=User,
+            dispatch_uid='token_cache_user',
+        )
+        m2m_changed.connect(
+            response_cache.recipe_tags_changed,
+            sender=Recipe.tags.through,
+            dispatch_uid='response_cache_recipe_tags',
+        )
@@ -0,0 +1,40 @@
+from django.urls import path
+
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+app_name = 'api'
+
+# Те же адреса, что в api.urls, но GET самых частых чтений
+# обслуживают асинхронные вью, а скачивание списка покупок отдаёт
+# файл целиком. Подключается из foodgram.asgi_urls.
+urlpatterns = [
+    path(
+        'users/subscriptions/',
+        async_views.subscriptions,
+        name='subscriptions',
+    ),
+    path('recipes/', async_views.recipe_list, name='recipes-list'),
+    path(
+        'recipes/<int:pk>/',
+        async_views.recipe_detail,
+        name='recipes-detail',
+    ),
+    path(
+        'recipes/download_shopping_cart/',
+        async_views.download_shopping_cart,
+        name='download_shopping_cart',
+    ),
+    path('tags/', async_views.tag_list, name='tags-list'),
+    path('tags/<int:pk>/', async_views.tag_detail, name='tags-detail'),
+    path(
+        'ingredients/',
+        async_views.ingredient_list,
+        name='ingredients-list',
+    ),
+    path(
+        'ingredients/<int:pk>/',
+        async_views.ingredient_detail,
+        name='ingredients-detail',
+    ),
+] + sync_urlpatterns
@@ -0,0 +1,290 @@
+"""
+Асинхронные GET для самых частых чтений: рецепты (список и рецепт),
+тэги, ингредиенты и подписки. Подключаются в foodgram.asgi_urls,
+то есть только при запуске через ASGI (foodgram.asgi).
+
+Настройки берутся из синхронных вьюсетов: queryset, фильтры,
+пагинация, права, сериализаторы и общий кэш ответов. Запросы в БД
+идут через async ORM, пока БД отвечает, воркер обслуживает другие
+запросы. Остальные методы (POST, PATCH, DELETE, ...) передаются
+синхронным вьюсетам как есть.
+
+Скачивание списка покупок остаётся синхронным, но его потоковый
+ответ собирается целиком в потоке вью (buffered_view).
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.authentication import get_authorization_header
+from rest_framework.request import Request
+
+from . import helpers
+from .authentication import aget_token_user
+from .relations import aget_user_relations
+from .renderers import TimedJSONRenderer
+from .response_cache import AnonymousCacheMixin, make_key
+from .serializers import SubscribeSerializer
+from .views import (
+    DownloadShoppingCart,
+    IngredientViewSet,
+    RecipeViewSet,
+    SubscriptionsView,
+    TagViewSet,
+)
+
+
+def render(data, status=200, headers=None):
+    response = HttpResponse(
+        TimedJSONRenderer().render(data),
+        status=status,
+        content_type='application/json',
+    )
+    for name, value in (headers or {}).items():
+        response[name] = value
+
+    return response
+
+
+def render_error(exc):
+    """Ответ на APIException в том же виде, что у DRF."""
+
+    headers = {}
+    if isinstance(exc, (
+        exceptions.NotAuthenticated, exceptions.AuthenticationFailed
+    )):
+        headers['WWW-Authenticate'] = 'Token'
+    data = exc.detail
+    if not isinstance(data, (list, dict)):
+        data = {'detail': data}
+
+    return render(data, exc.status_code, headers)
+
+
+async def authenticate(request):
+    """CachedTokenAuthentication для асинхронных вью."""
+
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != b'token':
+
+        return AnonymousUser()
+
+    if len(auth) != 2:
+        raise exceptions.AuthenticationFailed('Invalid token header.')
+
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed('Invalid token.')
+
+    return await aget_token_user(key)
+
+
+def init_view(view_class, request, action, kwargs):
+    view = view_class(
+        request=request,
+        args=(),
+        kwargs=kwargs,
+        format_kwarg=None,
+        headers={},
+    )
+    view.action = action
+    for permission in view.get_permissions():
+        if not permission.has_permission(request, view):
+            if request.user.is_anonymous:
+                raise exceptions.NotAuthenticated()
+            raise exceptions.PermissionDenied(
+                getattr(permission, 'message', None)
+            )
+
+    return view
+
+
+async def list_data(view, request):
+    queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+    paginator = view.paginator
+    page = None
+    if paginator is not None:
+        page = await paginator.apaginate_queryset(queryset, request, view)
+    objects = page if page is not None else [
+        obj async for obj in queryset
+    ]
+
+    await aget_user_relations(request)
+    data = view.get_serializer(objects, many=True).data
+    if page is not None:
+
+        return paginator.get_paginated_response(data).data
+
+    return data
+
+
+async def retrieve_data(view, request):
+    try:
+        obj = await view.get_queryset().aget(pk=view.kwargs['pk'])
+    except ObjectDoesNotExist:
+        raise exceptions.NotFound()
+
+    await aget_user_relations(request)
+
+    return view.get_serializer(obj).data
+
+
+async def ingredient_search_data(view, request):
+    # Поиск идёт по индексу в памяти, в БД - только при его пересборке.
+    response = await sync_to_async(view.search)(request)
+
+    return response.data
+
+
+async def subscriptions_data(view, request):
+    paginator = view.get_paginator()
+    page = await paginator.apaginate_queryset(
+        view.get_queryset(), request, view
+    )
+    authors = page if page is not None else [
+        author async for author in view.get_queryset()
+    ]
+    # prefetch_related_objects в Django 4.1 есть только синхронный.
+    await sync_to_async(helpers.prefetch_author_recipes)(
+        authors, helpers.get_recipes_limit(request)
+    )
+
+    data = SubscribeSerializer(
+        authors, many=True, context={'request': request}
+    ).data
+    if page is not None:
+
+        return paginator.get_paginated_response(data).data
+
+    return data
+
+
+async def cached_data(view, request, load):
+    """Асинхронный вариант AnonymousCacheMixin.cached_response."""
+
+    if not (
+        request.user.is_anonymous or view.shares_anonymous_cache(request)
+    ):
+
+        return await load(view, request), None
+
+    # get_cache_dependencies может сходить в БД.
+    key = await sync_to_async(
+        lambda: make_key(request, view.get_cache_dependencies()),
+        thread_sensitive=False,
+    )()
+    data = await cache.aget(key)
+    if data is not None:
+        await aget_user_relations(request)
+
+        return view.personalize(data, request), 'hit'
+
+    data = await load(view, request)
+    await cache.aset(
+        key, view.personalize(data, None), settings.RESPONSE_CACHE_TIMEOUT
+    )
+
+    return data, 'miss'
+
+
+def async_read_view(view_class, action, load, sync_view):
+    """GET обслуживается асинхронно через load, остальное - sync_view."""
+
+    async def view(request, *args, **kwargs):
+        if request.method != 'GET':
+
+            return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+        request = Request(request)
+        try:
+            request.user = await authenticate(request)
+            read_view = init_view(view_class, request, action, kwargs)
+            if isinstance(read_view, AnonymousCacheMixin):
+                data, cache_status = await cached_data(
+                    read_view, request, load
+                )
+            else:
+                data, cache_status = await load(read_view, request), None
+        except exceptions.APIException as exc:
+
+            return render_error(exc)
+
+        headers = {'X-Response-Cache': cache_status} if cache_status else {}
+
+        return render(data, headers=headers)
+
+    # csrf_exempt в Django 4.1 не умеет оборачивать корутины.
+    view.csrf_exempt = True
+
+    return view
+
+
+def buffered_view(sync_view):
+    """
+    Синхронная вью с потоковым ответом для ASGI. Django 4.1 читает тело
+    StreamingHttpResponse в потоке событийного цикла, где запросы в БД
+    запрещены, поэтому тело собирается в потоке вью и отдаётся целиком.
+    """
+
+    def run(request, *args, **kwargs):
+        response = sync_view(request, *args, **kwargs)
+        if not response.streaming:
+
+            return response
+
+        buffered = HttpResponse(
+            b''.join(response.streaming_content),
+            status=response.status_code,
+        )
+        for name, value in response.items():
+            buffered[name] = value
+
+        return buffered
+
+    async def view(request, *args, **kwargs):
+
+        return await sync_to_async(run)(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+
+    return view
+
+
+recipe_list = async_read_view(
+    RecipeViewSet, 'list', list_data,
+    RecipeViewSet.as_view({'get': 'list', 'post': 'create'}),
+)
+recipe_detail = async_read_view(
+    RecipeViewSet, 'retrieve', retrieve_data,
+    RecipeViewSet.as_view({
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    }),
+)
+tag_list = async_read_view(
+    TagViewSet, 'list', list_data,
+    TagViewSet.as_view({'get': 'list'}),
+)
+tag_detail = async_read_view(
+    TagViewSet, 'retrieve', retrieve_data,
+    TagViewSet.as_view({'get': 'retrieve'}),
+)
+ingredient_list = async_read_view(
+    IngredientViewSet, 'list', ingredient_search_data,
+    IngredientViewSet.as_view({'get': 'list'}),
+)
+ingredient_detail = async_read_view(
+    IngredientViewSet, 'retrieve', retrieve_data,
+    IngredientViewSet.as_view({'get': 'retrieve'}),
+)
+subscriptions = async_read_view(
+    SubscriptionsView, None, subscriptions_data,
+    SubscriptionsView.as_view(),
+)
+download_shopping_cart = buffered_view(DownloadShoppingCart.as_view())
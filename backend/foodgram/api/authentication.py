@@ -0,0 +1,195 @@
+"""
+Аутентификация по токену без запроса в БД на каждый вызов.
+Пользователь токена ищется в LRU-кэше процесса, затем в кэше Django
+и только потом в БД. Удаление токена (выход через djoser, админка)
+и любое изменение пользователя, кроме входа, сбрасывают записи после
+коммита: в кэше Django и в кэше текущего процесса сразу, в кэшах
+других процессов - не позже чем через TOKEN_CACHE_LOCAL_TIMEOUT секунд.
+
+Кэш Django используется, только если он общий (см. checks): в кэше
+в памяти процесса сброс не дошёл бы до других процессов, и токен
+продолжал бы работать до TOKEN_CACHE_TIMEOUT секунд после выхода.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .checks import cache_is_process_local
+
+TOKEN_KEY = 'auth_token:{digest}'
+
+
+class TokenCache:
+    """
+    LRU-кэш пользователей по ключу токена в памяти процесса.
+    get() отдаёт копию: запросы в разных потоках не делят один объект.
+    """
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[1] < time.monotonic():
+                self.misses += 1
+
+                return None
+
+            self._items.move_to_end(key)
+            self.hits += 1
+
+            return copy.copy(item[0])
+
+    def set(self, key, user):
+        if not self.max_entries or not self.timeout:
+
+            return
+
+        with self._lock:
+            self._items[key] = (
+                copy.copy(user), time.monotonic() + self.timeout
+            )
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._items),
+                'max_entries': self.max_entries,
+            }
+
+
+token_cache = TokenCache(
+    settings.TOKEN_CACHE_SIZE,
+    min(settings.TOKEN_CACHE_LOCAL_TIMEOUT, settings.TOKEN_CACHE_TIMEOUT),
+)
+
+
+def uses_shared_cache():
+
+    return bool(settings.TOKEN_CACHE_TIMEOUT) and not cache_is_process_local()
+
+
+def shared_key(key):
+    # В общем кэше не храним сами токены.
+
+    return TOKEN_KEY.format(digest=hashlib.sha256(key.encode()).hexdigest())
+
+
+def check_user(user):
+    if not user.is_active:
+        raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+    return user
+
+
+def get_token_user(key):
+    user = token_cache.get(key)
+    if user is None:
+        shared = uses_shared_cache()
+        if shared:
+            user = cache.get(shared_key(key))
+        if user is None:
+            try:
+                token = Token.objects.select_related('user').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+
+            user = check_user(token.user)
+            if shared:
+                cache.set(
+                    shared_key(key), user, settings.TOKEN_CACHE_TIMEOUT
+                )
+        token_cache.set(key, user)
+
+    return check_user(user)
+
+
+async def aget_token_user(key):
+    """get_token_user для асинхронных вью, запрос - async ORM."""
+
+    user = token_cache.get(key)
+    if user is None:
+        shared = uses_shared_cache()
+        if shared:
+            user = await cache.aget(shared_key(key))
+        if user is None:
+            try:
+                token = await Token.objects.select_related('user').aget(
+                    key=key
+                )
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+
+            user = check_user(token.user)
+            if shared:
+                await cache.aset(
+                    shared_key(key), user, settings.TOKEN_CACHE_TIMEOUT
+                )
+        token_cache.set(key, user)
+
+    return check_user(user)
+
+
+def forget_tokens(*keys):
+    """Сбрасывает токены после коммита текущей транзакции."""
+
+    def forget():
+        for key in keys:
+            token_cache.delete(key)
+        cache.delete_many([shared_key(key) for key in keys])
+
+    transaction.on_commit(forget)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с пользователем из кэша."""
+
+    def authenticate_credentials(self, key):
+
+        return get_token_user(key), key
+
+
+def token_deleted(sender, instance, **kwargs):
+    forget_tokens(instance.key)
+
+
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login.
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+
+        return
+
+    keys = list(
+        Token.objects.filter(user_id=instance.pk).values_list('key', flat=True)
+    )
+    if keys:
+        forget_tokens(*keys)
@@ -0,0 +1,43 @@
+"""
+Проверки настроек при запуске: manage.py check, migrate в enterypoint.sh
+и runserver. Версии корзин, поколения кэша ответов, версия индекса
+ингредиентов и сброс токенов доходят до других процессов только через
+общий кэш, поэтому с кэшем в памяти процесса сервер должен работать
+одним воркером.
+"""
+import os
+
+from django.conf import settings
+from django.core.checks import Error
+
+# Бэкенды кэша, которые видны только своему процессу.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_process_local():
+
+    return settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """Несколько воркеров - только с общим кэшем."""
+
+    # WEB_CONCURRENCY - число воркеров gunicorn по умолчанию.
+    workers = int(os.getenv('WEB_CONCURRENCY') or 1)
+    if workers > 1 and cache_is_process_local():
+
+        return [Error(
+            f'WEB_CONCURRENCY is {workers}, but the default cache is'
+            ' process-local: cache invalidation will not reach other'
+            ' workers.',
+            hint=(
+                'Set CACHE_BACKEND and CACHE_LOCATION to a shared cache'
+                ' (Redis, Memcached) or run a single worker.'
+            ),
+            id='api.E001',
+        )]
+
+    return []
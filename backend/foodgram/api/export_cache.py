@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+CART_VERSION_KEY = 'shopping_cart_version:{user_id}'
+
+
+def get_cart_version(user_id):
+    """
+    Текущая версия корзины пользователя.
+    Хранится в кэше Django (для нескольких воркеров нужен общий бэкенд).
+    Начальное значение - время в наносекундах, чтобы после вытеснения
+    ключа из кэша версия не совпала со старой.
+    """
+
+    return cache.get_or_set(
+        CART_VERSION_KEY.format(user_id=user_id),
+        time.time_ns,
+        timeout=None,
+    )
+
+
+def bump_cart_version(*user_ids):
+    """Сдвигает версию корзины после коммита текущей транзакции."""
+
+    def bump():
+        for user_id in user_ids:
+            key = CART_VERSION_KEY.format(user_id=user_id)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), timeout=None)
+
+    transaction.on_commit(bump)
+
+
+class ExportCache:
+    """
+    LRU-кэш готовых файлов списка покупок в памяти процесса.
+    Ключ - (user_id, версия корзины, формат), размер ограничен
+    суммарным объёмом хранимых байт.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            content = self._items.get(key)
+            if content is None:
+                self.misses += 1
+
+                return None
+
+            self._items.move_to_end(key)
+            self.hits += 1
+
+            return content
+
+    def set(self, key, content):
+        if len(content) > self.max_bytes:
+
+            return
+
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+
+            self._items[key] = content
+            self.size += len(content)
+
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def stream_through(self, key, chunks):
+        """
+        Отдаёт куски файла дальше и кладёт собранный файл в кэш,
+        когда поток закончился. Слишком большие файлы не копятся.
+        """
+        collected = []
+        size = 0
+
+        for chunk in chunks:
+            if collected is not None:
+                size += len(chunk)
+                if size <= self.max_bytes:
+                    collected.append(chunk)
+                else:
+                    collected = None
+
+            yield chunk
+
+        if collected is not None:
+            self.set(key, b''.join(collected))
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._items),
+                'size': self.size,
+                'max_size': self.max_bytes,
+            }
+
+
+export_cache = ExportCache(settings.SHOPPING_LIST_CACHE_MAX_BYTES)
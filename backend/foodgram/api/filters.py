@@ -1,21 +1,8 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
-from recipes.models import Recipe, Tag, User
-
-
-class IngredientFilter(filters.FilterSet):
-    """Просто фильтр оп имени.
-    В будущем омжно сделать выдачу по лучшему совпадению?"""
-
-    name = filters.CharFilter(
-        method='filter_name', field_name='name')
-
-    def filter_name(self, queryset, field_name, value):
-        if value != "":
-            value = value.lower()
-            return queryset.filter(name__contains=value)
-
-        return queryset
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag, User
+from recipes.search import search_recipes
 
 
 class RecipeFilter(filters.FilterSet):
@@ -24,6 +11,7 @@ class RecipeFilter(filters.FilterSet):
     Доп поля:
      - добавлено в избраное
      - подписан на автора
+     - полнотекстовый поиск (search), сортирует по релевантности
     """
 
     author = filters.ModelChoiceFilter(
@@ -42,15 +30,37 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart',
     )
+    search = filters.CharFilter(
+        method='get_search',
+    )
 
     def get_is_favorited(self,  queryset, field_name, value):
 
-        return queryset.filter(favorite__user=self.request.user)
+        return self.filter_user_list(queryset, Favorite, value)
 
     def get_is_in_shopping_cart(self, queryset, field_name, value):
 
-        return queryset.filter(shopping_cart__user=self.request.user)
+        return self.filter_user_list(queryset, ShoppingCart, value)
+
+    def filter_user_list(self, queryset, model, value):
+        """Рецепты, которые есть (или нет) в списке пользователя."""
+        user = self.request.user
+        if user.is_anonymous:
+
+            return queryset.none() if value else queryset
+
+        in_list = Exists(model.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        ))
+
+        return queryset.filter(in_list if value else ~in_list)
+
+    def get_search(self, queryset, field_name, value):
+
+        return search_recipes(queryset, value)
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'author', 'tags', 'is_favorited', 'is_in_shopping_cart', 'search',
+        )
@@ -1,4 +1,6 @@
-from recipes.models import IngredientAmount
+from django.db.models import Prefetch, prefetch_related_objects
+
+from recipes.models import IngredientAmount, Recipe
 
 
 def set_tags_ingredients(recipe, ingredients, tags):
@@ -15,3 +17,89 @@ def set_tags_ingredients(recipe, ingredients, tags):
     IngredientAmount.objects.bulk_create(ingredient_list)
 
     return recipe
+
+
+def update_tags(recipe, tags):
+    """Меняет тэги рецепта, только если набор другой."""
+    current = set(recipe.tags.values_list('pk', flat=True))
+    if current == {tag.pk for tag in tags}:
+
+        return False
+
+    recipe.tags.set(tags)
+
+    return True
+
+
+def update_ingredients(recipe, ingredients):
+    """
+    Сравнивает ингредиенты рецепта с присланными: новые добавляет,
+    лишние удаляет, у оставшихся обновляет только изменённое количество.
+    Возвращает True, если что-то поменялось.
+    """
+    current = {
+        amount.ingredient_id: amount
+        for amount in recipe.ingredient_amount.all()
+    }
+    wanted = {
+        ingredient['id'].pk: ingredient['amount']
+        for ingredient in ingredients
+    }
+
+    removed = [
+        amount.pk
+        for ingredient_id, amount in current.items()
+        if ingredient_id not in wanted
+    ]
+    changed = []
+    added = []
+    for ingredient_id, value in wanted.items():
+        amount = current.get(ingredient_id)
+        if amount is None:
+            added.append(IngredientAmount(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=value,
+            ))
+        elif amount.amount != value:
+            amount.amount = value
+            changed.append(amount)
+
+    if removed:
+        IngredientAmount.objects.filter(pk__in=removed).delete()
+    if changed:
+        IngredientAmount.objects.bulk_update(changed, ['amount'])
+    if added:
+        IngredientAmount.objects.bulk_create(added)
+
+    return bool(removed or changed or added)
+
+
+def get_recipes_limit(request):
+    """Параметр recipes_limit из запроса, None если не задан или кривой."""
+    try:
+        limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+
+        return None
+
+    return limit if limit >= 0 else None
+
+
+def prefetch_author_recipes(authors, recipes_limit=None):
+    """
+    Подгружает рецепты авторов в author.recipes_preview одним запросом.
+    С recipes_limit - только последние recipes_limit рецептов каждого.
+    """
+    queryset = Recipe.objects.all()
+    if recipes_limit is not None:
+        queryset = queryset.latest_per_author(
+            [author.pk for author in authors], recipes_limit
+        )
+
+    prefetch_related_objects(
+        authors,
+        Prefetch('recipes', queryset=queryset, to_attr='recipes_preview'),
+    )
+
+    return authors
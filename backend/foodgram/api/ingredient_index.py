@@ -0,0 +1,166 @@
+import bisect
+import threading
+import time
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .response_cache import bump_generations
+from recipes.models import Ingredient
+
+INDEX_VERSION_KEY = 'ingredient_index_version'
+
+
+class IndexedIngredient(NamedTuple):
+    """Ингредиент в индексе, поля как у модели Ingredient."""
+
+    id: int
+    name: str
+    measurement_unit: str
+
+
+def normalize(value):
+    """Регистр, ё/е и лишние пробелы не влияют на поиск."""
+
+    return ' '.join(value.casefold().replace('ё', 'е').split())
+
+
+class IngredientIndex:
+    """
+    Неизменяемый индекс ингредиентов для автодополнения.
+    Префиксный поиск - bisect по отсортированным нормализованным именам,
+    дальше совпадения с начала слова и вхождения в середине имени.
+    """
+
+    def __init__(self, ingredients):
+        self.items = tuple(ingredients)
+        self._normalized = tuple(normalize(item.name) for item in self.items)
+        order = sorted(
+            range(len(self.items)), key=lambda pos: self._normalized[pos]
+        )
+        self._sorted_names = [self._normalized[pos] for pos in order]
+        self._sorted_positions = order
+
+    def __len__(self):
+
+        return len(self.items)
+
+    def search(self, query, limit=None):
+        """
+        Сначала точное совпадение и совпадения по началу имени
+        (короткие имена выше), затем по началу слова, затем по вхождению.
+        """
+        query = normalize(query)
+        if not query:
+
+            return list(self.items[:limit])
+
+        start = bisect.bisect_left(self._sorted_names, query)
+        end = bisect.bisect_left(self._sorted_names, query + '\uffff')
+        names = self._normalized
+        prefix = sorted(
+            self._sorted_positions[start:end],
+            key=lambda pos: (len(names[pos]), names[pos]),
+        )
+        result = prefix[:limit]
+
+        if limit is None or len(result) < limit:
+            found = set(prefix)
+            word_start = []
+            substring = []
+            for pos, name in enumerate(names):
+                if pos in found:
+                    continue
+                index = name.find(query)
+                if index < 0:
+                    continue
+                if name[index - 1] == ' ':
+                    word_start.append(pos)
+                else:
+                    substring.append(pos)
+            result += word_start + substring
+            result = result[:limit]
+
+        return [self.items[pos] for pos in result]
+
+
+class IngredientIndexHolder:
+    """
+    Индекс текущего процесса. Перестраивается из БД, когда
+    версия в кэше Django поменялась (см. bump_index_version).
+
+    С кэшем в памяти процесса версию из manage.py команд (importcsv)
+    веб-процессы не видят, поэтому раз в INGREDIENT_INDEX_CHECK_INTERVAL
+    секунд число ингредиентов и наибольший id сверяются с индексом.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._version = None
+        self._catalog = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def check_catalog(self):
+        """Сбрасывает индекс и ответы, если каталог поменялся не здесь."""
+
+        interval = settings.INGREDIENT_INDEX_CHECK_INTERVAL
+        if (
+            not interval
+            or self._index is None
+            or time.monotonic() - self._checked_at < interval
+        ):
+
+            return
+
+        self._checked_at = time.monotonic()
+        catalog = Ingredient.objects.aggregate(
+            count=Count('id'), last=Max('id')
+        )
+        if (catalog['count'], catalog['last']) != self._catalog:
+            bump_index_version()
+            bump_generations('ingredients')
+
+    def get(self):
+        self.check_catalog()
+        version = cache.get_or_set(
+            INDEX_VERSION_KEY, time.time_ns, timeout=None
+        )
+        if self._index is not None and self._version == version:
+
+            return self._index
+
+        with self._lock:
+            if self._index is None or self._version != version:
+                index = IngredientIndex(
+                    IndexedIngredient(*row)
+                    for row in Ingredient.objects.order_by('id').values_list(
+                        'id', 'name', 'measurement_unit'
+                    )
+                )
+                self._catalog = (
+                    len(index),
+                    index.items[-1].id if index.items else None,
+                )
+                self._checked_at = time.monotonic()
+                self._index = index
+                self._version = version
+
+        return self._index
+
+
+ingredient_index = IngredientIndexHolder()
+
+
+def bump_index_version(*args, **kwargs):
+    """
+    Помечает индексы всех процессов устаревшими.
+    Подключена к post_save/post_delete модели Ingredient,
+    после bulk операций её нужно вызывать явно.
+    """
+    try:
+        cache.incr(INDEX_VERSION_KEY)
+    except ValueError:
+        cache.set(INDEX_VERSION_KEY, time.time_ns(), timeout=None)
@@ -0,0 +1,533 @@
+"""
+Замеры всех маршрутов api/urls.py на синтетических данных.
+Данные создаются в отдельной тестовой БД (для SQLite - в памяти,
+для PostgreSQL - test_<имя базы>), кэш - отдельный LocMemCache,
+картинки пишутся во временный каталог. Результат можно сохранить
+в JSON (--output) и сравнить с прошлым прогоном (--compare).
+"""
+import base64
+import io
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from itertools import combinations
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.export_cache import export_cache
+from recipes import synthetic
+from recipes.models import Ingredient, Recipe, Subscription, Tag, User
+
+FILTERS = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+
+
+class Case:
+    """
+    Один замер: request(index) -> (метод, путь, данные), client -
+    'user', 'admin' или 'anon'. setup(index) выполняется до запроса
+    и в замер не входит.
+    """
+
+    def __init__(self, name, request, client='user', setup=None):
+        self.name = name
+        self.request = request
+        self.client = client
+        self.setup = setup
+
+
+def percentile(timings, share):
+
+    return timings[min(len(timings) - 1, int(len(timings) * share))]
+
+
+def image_base64():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), (90, 160, 60)).save(buffer, 'PNG')
+
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+def git_commit():
+    try:
+
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+
+        return None
+
+
+class Command(BaseCommand):
+    """Латентность, запросы в БД и память на каждый маршрут API."""
+
+    help = (
+        'Seed a test database with synthetic data and measure latency'
+        + ' percentiles, queries per request and peak memory for every'
+        + ' API route. Renditions are made inline, caches are private.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--ingredients', type=int, default=1000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--case', action='append', dest='cases',
+            help='Только замеры, в имени которых есть подстрока.',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Чистить кэши перед каждым запросом.',
+        )
+        parser.add_argument('--output', help='Файл для JSON результата.')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения.',
+        )
+
+    def handle(self, *args, **options):
+        """Замеры в тестовой БД."""
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False,
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(
+                    MEDIA_ROOT=media_root,
+                    CACHES={'default': {
+                        'BACKEND': (
+                            'django.core.cache.backends.locmem.LocMemCache'
+                        ),
+                        'LOCATION': 'benchapi',
+                    }},
+                    IMAGE_RENDITIONS_ASYNC=False,
+                    SLOW_REQUEST_MS=0,
+                ):
+                    result = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(result, file, indent=2, ensure_ascii=False)
+
+        previous = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = {
+                    case['name']: case for case in json.load(file)['cases']
+                }
+        self.report(result, previous)
+
+    def run(self, options):
+        start = time.perf_counter()
+        data = synthetic.generate(
+            users=options['users'],
+            recipes=options['recipes'],
+            ingredients=options['ingredients'],
+            tags=options['tags'],
+            seed=options['seed'],
+        )
+        seed_time = time.perf_counter() - start
+
+        self.prepare(data)
+        cases = [
+            case for case in self.get_cases(data)
+            if not options['cases'] or any(
+                part in case.name for part in options['cases']
+            )
+        ]
+        results = [self.measure(case, options) for case in cases]
+
+        return {
+            'meta': {
+                'commit': git_commit(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'scale': {
+                    name: options[name]
+                    for name in ('users', 'recipes', 'ingredients', 'tags')
+                },
+                'seed': options['seed'],
+                'seed_time': round(seed_time, 2),
+                'iterations': options['iterations'],
+                'cold': options['cold'],
+            },
+            'cases': results,
+        }
+
+    def prepare(self, data):
+        """Клиенты и пользователи, от имени которых идут запросы."""
+
+        # Распределения степенные: замеры идут от самого активного
+        # пользователя, а чужой автор - самый плодовитый.
+        users = User.objects.filter(pk__in=data['users'])
+        self.user = users.annotate(
+            activity=(
+                Count('favorite', distinct=True)
+                + Count('shopping_cart', distinct=True)
+            )
+        ).order_by('-activity', 'pk').first()
+        self.other = users.exclude(pk=self.user.pk).annotate(
+            recipes_total=Count('recipes')
+        ).order_by('-recipes_total', 'pk').first()
+        self.login_user = users.exclude(
+            pk__in=(self.user.pk, self.other.pk)
+        ).order_by('pk').first()
+        admin = User.objects.create_superuser(
+            'benchapi_admin', 'benchapi_admin@example.com',
+            synthetic.PASSWORD,
+        )
+        self.clients = {'anon': APIClient()}
+        for name, user in (('user', self.user), ('admin', admin)):
+            client = APIClient()
+            client.credentials(
+                HTTP_AUTHORIZATION='Token '
+                + Token.objects.get_or_create(user=user)[0].key
+            )
+            self.clients[name] = client
+
+        self.own_recipe = Recipe.objects.create(
+            author=self.user,
+            name='Рецепт для замеров',
+            image=synthetic.placeholder_images(1)[0],
+            text='Текст',
+            cooking_time=10,
+        )
+        self.foreign_recipe = Recipe.objects.exclude(
+            author=self.user
+        ).values_list('pk', flat=True).first()
+        self.followed = self.other.pk
+        Subscription.objects.filter(
+            user=self.user, author=self.followed
+        ).delete()
+        self.image = image_base64()
+
+    def payload(self, data, index):
+        ingredients = data['ingredients']
+
+        return {
+            'tags': [
+                tag.pk for tag in self.tags(data)[:1 + index % 2]
+            ],
+            'ingredients': [
+                {
+                    'id': ingredients[(index + shift) % len(ingredients)],
+                    'amount': 10 + index % 5,
+                }
+                for shift in range(3 + index % 2)
+            ],
+            'name': f'Рецепт {index}',
+            'image': self.image,
+            'text': f'Шаги приготовления {index}',
+            'cooking_time': 5 + index % 30,
+        }
+
+    def tags(self, data):
+
+        return list(Tag.objects.filter(slug__in=data['tags']).order_by('pk'))
+
+    def get_cases(self, data):
+        user, other = self.user, self.other
+        recipe = self.foreign_recipe
+        own = self.own_recipe.pk
+        ingredient = Ingredient.objects.get(pk=data['ingredients'][0])
+        prefix = ingredient.name[:2]
+        filters = {
+            'author': f'author={other.pk}',
+            'tags': '&'.join(f'tags={slug}' for slug in data['tags'][:2]),
+            'is_favorited': 'is_favorited=1',
+            'is_in_shopping_cart': 'is_in_shopping_cart=1',
+        }
+        client = self.clients['user']
+
+        def get(path):
+
+            return lambda index: ('get', path, None)
+
+        def toggle(path, add):
+            """Добавление/удаление, перед замером - обратное действие."""
+
+            def setup(index):
+                getattr(client, 'delete' if add else 'post')(
+                    path, format='json'
+                )
+
+            return setup, lambda index: (
+                'post' if add else 'delete', path, {}
+            )
+
+        def batch(path, add):
+            ids = data['recipes'][:10]
+
+            def setup(index):
+                getattr(client, 'delete' if add else 'post')(
+                    path, {'recipes': ids}, format='json'
+                )
+
+            return setup, lambda index: (
+                'post' if add else 'delete', path, {'recipes': ids}
+            )
+
+        def delete_setup(index):
+            self.deleted = Recipe.objects.create(
+                author=user,
+                name='Рецепт на удаление',
+                image=synthetic.placeholder_images(1)[0],
+                text='Текст',
+                cooking_time=10,
+            ).pk
+
+        def logout_setup(index):
+            self.logout_token = Token.objects.get_or_create(
+                user=self.login_user
+            )[0].key
+            self.clients['logout'] = APIClient()
+            self.clients['logout'].credentials(
+                HTTP_AUTHORIZATION=f'Token {self.logout_token}'
+            )
+
+        cases = [
+            Case('users-list', get('/api/users/?limit=10')),
+            Case('users-detail', get(f'/api/users/{other.pk}/')),
+            Case('users-me', get('/api/users/me/')),
+            Case('users-create', lambda index: ('post', '/api/users/', {
+                'email': f'benchapi_{index}@example.com',
+                'username': f'benchapi_{index}',
+                'first_name': 'Имя',
+                'last_name': 'Фамилия',
+                'password': synthetic.PASSWORD,
+            }), client='anon'),
+            Case('users-set-password', lambda index: (
+                'post', '/api/users/set_password/', {
+                    'current_password': synthetic.PASSWORD,
+                    'new_password': synthetic.PASSWORD,
+                },
+            )),
+            Case('auth-login', lambda index: (
+                'post', '/api/auth/token/login/', {
+                    'email': self.login_user.email,
+                    'password': synthetic.PASSWORD,
+                },
+            ), client='anon'),
+            Case(
+                'auth-logout',
+                lambda index: ('post', '/api/auth/token/logout/', {}),
+                client='logout', setup=logout_setup,
+            ),
+            Case('tags-list', get('/api/tags/'), client='anon'),
+            Case(
+                'tags-detail', get(f'/api/tags/{self.tags(data)[0].pk}/'),
+                client='anon',
+            ),
+            Case(
+                'ingredients-search',
+                get(f'/api/ingredients/?name={prefix}'), client='anon',
+            ),
+            Case(
+                'ingredients-detail',
+                get(f'/api/ingredients/{ingredient.pk}/'), client='anon',
+            ),
+            Case(
+                'recipes-list-anon', get('/api/recipes/?limit=6'),
+                client='anon',
+            ),
+            Case('recipes-list', get('/api/recipes/?limit=6')),
+            Case('recipes-list-page-10', get('/api/recipes/?page=10&limit=6')),
+            Case('recipes-list-keyset', get('/api/recipes/?cursor=&limit=6')),
+            Case(
+                'recipes-list-search',
+                get(f'/api/recipes/?search={synthetic.WORDS[0]}&limit=6'),
+            ),
+        ]
+        for size in range(1, len(FILTERS) + 1):
+            for names in combinations(FILTERS, size):
+                query = '&'.join(filters[name] for name in names)
+                cases.append(Case(
+                    'recipes-filter-' + '+'.join(names),
+                    get(f'/api/recipes/?{query}&limit=6'),
+                ))
+
+        cases += [
+            Case(
+                'recipes-detail-anon', get(f'/api/recipes/{recipe}/'),
+                client='anon',
+            ),
+            Case('recipes-detail', get(f'/api/recipes/{recipe}/')),
+            Case('recipes-create', lambda index: (
+                'post', '/api/recipes/', self.payload(data, index),
+            )),
+            Case('recipes-update', lambda index: (
+                'patch', f'/api/recipes/{own}/', self.payload(data, index),
+            )),
+            Case(
+                'recipes-delete',
+                lambda index: ('delete', f'/api/recipes/{self.deleted}/', {}),
+                setup=delete_setup,
+            ),
+        ]
+        for name, path in (
+            ('favorite', f'/api/recipes/{recipe}/favorite/'),
+            ('shopping-cart', f'/api/recipes/{recipe}/shopping_cart/'),
+            ('subscribe', f'/api/users/{self.followed}/subscribe/'),
+        ):
+            for add, action in ((True, 'add'), (False, 'remove')):
+                setup, request = toggle(path, add)
+                cases.append(Case(f'{name}-{action}', request, setup=setup))
+        for name, path in (
+            ('favorite-batch', '/api/recipes/favorite/'),
+            ('shopping-cart-batch', '/api/recipes/shopping_cart/'),
+        ):
+            for add, action in ((True, 'add'), (False, 'remove')):
+                setup, request = batch(path, add)
+                cases.append(Case(f'{name}-{action}', request, setup=setup))
+
+        cases.append(Case(
+            'subscriptions',
+            get('/api/users/subscriptions/?limit=6&recipes_limit=3'),
+        ))
+        for file_format in ('pdf', 'txt', 'csv', 'json'):
+            cases.append(Case(
+                f'download-shopping-cart-{file_format}',
+                get(
+                    '/api/recipes/download_shopping_cart/'
+                    f'?format={file_format}'
+                ),
+            ))
+        cases += [
+            Case(
+                'download-shopping-cart-stats',
+                get('/api/recipes/download_shopping_cart/stats/'),
+                client='admin',
+            ),
+            Case(
+                'db-pool-stats', get('/api/db_pool/stats/'),
+                client='admin',
+            ),
+        ]
+
+        return cases
+
+    def clear_caches(self):
+        cache.clear()
+        export_cache.clear()
+
+    def call(self, case, index, options):
+        """Один запрос: (статус, секунды, запросов в БД)."""
+
+        if case.setup:
+            case.setup(index)
+        if options['cold']:
+            self.clear_caches()
+        method, path, payload = case.request(index)
+        client = self.clients[case.client]
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            start = time.perf_counter()
+            if payload is None:
+                response = getattr(client, method)(path)
+            else:
+                response = getattr(client, method)(
+                    path, payload, format='json'
+                )
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+
+        return response.status_code, elapsed, queries[0], path
+
+    def measure(self, case, options):
+        for index in range(options['warmup']):
+            self.call(case, index, options)
+
+        statuses = Counter()
+        timings = []
+        queries = []
+        for index in range(options['iterations']):
+            status, elapsed, count, path = self.call(
+                case, options['warmup'] + index, options
+            )
+            statuses[status] += 1
+            timings.append(elapsed)
+            queries.append(count)
+
+        # Память - отдельным запросом: tracemalloc замедляет код.
+        tracemalloc.start()
+        self.call(case, options['warmup'] + options['iterations'], options)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        timings.sort()
+        if options['verbosity'] > 1:
+            self.stderr.write(case.name)
+
+        return {
+            'name': case.name,
+            'path': path,
+            'client': case.client,
+            'statuses': {str(code): count for code, count in statuses.items()},
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 3),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+            'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+            'queries_min': min(queries),
+            'queries_max': max(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def report(self, result, previous):
+        meta = result['meta']
+        self.stdout.write(
+            '{database}, commit {commit}, scale {scale},'
+            ' {iterations} iterations{mode}'.format(
+                mode=', cold caches' if meta['cold'] else '', **meta
+            )
+        )
+        for case in result['cases']:
+            line = (
+                '{name:<60} {p50_ms:9.2f} {p95_ms:9.2f} {p99_ms:9.2f} ms'
+                ' q={queries_min:>3}-{queries_max:<3}'
+                ' mem={peak_memory_kb:8.1f}KB {statuses}'.format(**case)
+            )
+            old = previous.get(case['name'])
+            if old:
+                line += ' | p50 {change:+.0%}, q {queries:+d}'.format(
+                    change=case['p50_ms'] / old['p50_ms'] - 1
+                    if old['p50_ms'] else 0,
+                    queries=case['queries_max'] - old['queries_max'],
+                )
+            self.stdout.write(line)
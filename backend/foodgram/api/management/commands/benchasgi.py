@@ -0,0 +1,207 @@
+"""
+Нагрузочное сравнение WSGI и ASGI: поднимает gunicorn с синхронными
+и с uvicorn воркерами (одинаковое число) на текущей БД и гоняет
+по обоим одинаковые GET запросы с заданной параллельностью.
+"""
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from itertools import cycle
+from urllib.parse import quote
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Ingredient, Recipe
+
+STACKS = {
+    'wsgi': ['foodgram.wsgi:application'],
+    'asgi': [
+        'foodgram.asgi:application',
+        '--worker-class', 'uvicorn.workers.UvicornWorker',
+    ],
+}
+
+
+def percentile(timings, share):
+
+    return timings[min(len(timings) - 1, int(len(timings) * share))]
+
+
+def default_paths(token):
+    paths = ['/api/recipes/?limit=6', '/api/tags/']
+    recipe = Recipe.objects.order_by('-id').values_list('id', flat=True)
+    if recipe:
+        paths.append(f'/api/recipes/{recipe[0]}/')
+    ingredient = Ingredient.objects.values_list('name', flat=True).first()
+    if ingredient:
+        paths.append(f'/api/ingredients/?name={quote(ingredient[:2])}')
+    if token:
+        paths.append('/api/users/subscriptions/?limit=6&recipes_limit=3')
+
+    return paths
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError('Сервер завершился при запуске.')
+        try:
+            socket.create_connection(('127.0.0.1', port), 0.5).close()
+
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f'Сервер не открыл порт {port} за {timeout} с.')
+
+
+class Command(BaseCommand):
+    """Одинаковая нагрузка на gunicorn с sync и с uvicorn воркерами."""
+
+    help = (
+        'Start gunicorn with sync and with uvicorn workers and compare'
+        + ' latency percentiles and throughput of the API reads.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument(
+            '--stacks', nargs='+', choices=STACKS, default=list(STACKS),
+        )
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Путь для запросов, можно несколько раз.',
+        )
+        parser.add_argument(
+            '--token', help='Токен пользователя, иначе - аноним.',
+        )
+        parser.add_argument(
+            '--no-response-cache', action='store_true',
+            help='Отключить общий кэш ответов (RESPONSE_CACHE_TIMEOUT=0).',
+        )
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        """Сравнение стеков."""
+        paths = options['paths'] or default_paths(options['token'])
+        headers = {'Host': '127.0.0.1'}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        env = dict(os.environ)
+        if options['no_response_cache']:
+            env['RESPONSE_CACHE_TIMEOUT'] = '0'
+
+        results = {}
+        for stack in options['stacks']:
+            process = subprocess.Popen(
+                [
+                    sys.executable, '-m', 'gunicorn', *STACKS[stack],
+                    '--bind', f'127.0.0.1:{options["port"]}',
+                    '--workers', str(options['workers']),
+                    '--log-level', 'warning',
+                ],
+                env=env,
+            )
+            try:
+                wait_for_port(options['port'], process)
+                results[stack] = self.run_load(
+                    options['port'], paths, headers,
+                    options['requests'], options['concurrency'],
+                )
+            finally:
+                process.terminate()
+                process.wait()
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'paths': paths,
+                'workers': options['workers'],
+                'concurrency': options['concurrency'],
+                'results': results,
+            }, indent=2))
+
+            return
+
+        self.stdout.write(
+            'workers {workers}, concurrency {concurrency}, paths: {paths}'
+            .format(
+                workers=options['workers'],
+                concurrency=options['concurrency'],
+                paths=', '.join(paths),
+            )
+        )
+        for stack, result in results.items():
+            self.stdout.write(
+                '{stack}: {rps:8.1f} req/s, p50 {p50:7.2f} ms,'
+                ' p95 {p95:7.2f} ms, p99 {p99:7.2f} ms,'
+                ' errors {errors}'.format(stack=stack, **result)
+            )
+
+    def run_load(self, port, paths, headers, total, concurrency):
+        """total запросов из concurrency соединений keep-alive."""
+
+        # Прогрев: импорт модулей, индекс ингредиентов, кэши.
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        for path in paths:
+            connection.request('GET', path, headers=headers)
+            connection.getresponse().read()
+        connection.close()
+
+        lock = threading.Lock()
+        queue = cycle(paths)
+        left = [total]
+        timings = []
+        errors = []
+
+        def client():
+            connection = http.client.HTTPConnection('127.0.0.1', port)
+            while True:
+                with lock:
+                    if not left[0]:
+                        break
+                    left[0] -= 1
+                    path = next(queue)
+                start = time.perf_counter()
+                try:
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    ok = False
+                elapsed = time.perf_counter() - start
+                with lock:
+                    timings.append(elapsed)
+                    if not ok:
+                        errors.append(path)
+            connection.close()
+
+        threads = [
+            threading.Thread(target=client) for _ in range(concurrency)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - start
+
+        timings.sort()
+
+        return {
+            'requests': len(timings),
+            'errors': len(errors),
+            'rps': len(timings) / duration,
+            'p50': percentile(timings, 0.5) * 1000,
+            'p95': percentile(timings, 0.95) * 1000,
+            'p99': percentile(timings, 0.99) * 1000,
+        }
@@ -0,0 +1,50 @@
+"""Micro-benchmark of the shopping list pdf renderer."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.pdf import render_shopping_list
+from api.shopping_list import ShoppingListItem
+
+
+class Command(BaseCommand):
+    """Render shopping lists of several sizes back-to-back and time them."""
+
+    help = (
+        'Render 10/100/1000 line shopping lists to pdf and print'
+        + ' per-document render time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[10, 100, 1000],
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        """Filler."""
+        for size in options['sizes']:
+            items = [
+                ShoppingListItem(
+                    index, f'ингредиент номер {index}', 'г', index % 999 + 1
+                )
+                for index in range(size)
+            ]
+            render_shopping_list(items)
+
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                content = render_shopping_list(items)
+                timings.append(time.perf_counter() - start)
+
+            timings.sort()
+            self.stdout.write(
+                '{size:>6} lines: median {median:8.2f} ms,'
+                ' min {best:8.2f} ms, {length} bytes'.format(
+                    size=size,
+                    median=timings[len(timings) // 2] * 1000,
+                    best=timings[0] * 1000,
+                    length=len(content),
+                )
+            )
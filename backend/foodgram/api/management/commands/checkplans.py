@@ -0,0 +1,72 @@
+"""EXPLAIN-based regression check for the hot API queries."""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.query_plans import explain, get_queries, seed_dataset
+
+
+class Rollback(Exception):
+    """Откатывает транзакцию с тестовыми данными."""
+
+
+class Command(BaseCommand):
+    """
+    Seed a dataset inside a transaction, EXPLAIN every hot query used by
+    RecipeViewSet, RecipeFilter, SubscriptionsView and the shopping list
+    export, and fail if any of them falls back to a sequential scan.
+    The transaction is rolled back, the database is left untouched.
+    """
+
+    help = (
+        'Check that hot API queries use indexes (EXPLAIN).'
+        + ' Works on PostgreSQL and SQLite; manage.py test runs the same'
+        + ' check in api.tests.test_plans.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=300)
+        parser.add_argument('--recipes', type=int, default=3000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--verbose-plans', action='store_true')
+
+    def handle(self, *args, **options):
+        """Filler."""
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f'Unsupported database: {connection.vendor}')
+
+        failures = []
+        try:
+            with transaction.atomic():
+                user = seed_dataset(
+                    options['users'],
+                    options['recipes'],
+                    options['ingredients'],
+                    options['seed'],
+                )
+                for name, queryset in get_queries(user):
+                    plan, scans = explain(queryset)
+                    if scans:
+                        failures.append(name)
+                    self.report(name, plan, scans, options['verbose_plans'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        if failures:
+            raise CommandError(
+                'Sequential scans in: ' + ', '.join(failures)
+            )
+
+        self.stdout.write(self.style.SUCCESS('All query plans use indexes'))
+
+    def report(self, name, plan, scans, verbose):
+        if scans:
+            self.stdout.write(self.style.ERROR(
+                f'FAIL {name}: sequential scan on {", ".join(scans)}'
+            ))
+        else:
+            self.stdout.write(f'ok   {name}')
+
+        if scans or verbose:
+            self.stdout.write(plan)
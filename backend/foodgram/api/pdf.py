@@ -0,0 +1,149 @@
+import io
+import os
+import threading
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+FONT_NAME = 'DejaVuSansCondensed'
+FONT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'DejaVuSansCondensed.ttf'
+)
+
+_font_lock = threading.Lock()
+
+
+def register_fonts():
+    """
+    Регистрирует шрифт в reportlab один раз на процесс.
+    Вызывается из ApiConfig.ready, повторные вызовы ничего не делают.
+    """
+    if FONT_NAME in pdfmetrics.getRegisteredFontNames():
+
+        return
+
+    with _font_lock:
+        if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+
+
+class ListPDFRenderer:
+    """
+    Рендер списка строк в pdf: заголовок, колонки и переход
+    на новую страницу, когда колонки заполнены.
+    Объект без состояния между документами, его можно
+    переиспользовать для рендера многих файлов подряд.
+    """
+
+    def __init__(
+        self,
+        pagesize=A4,
+        font_size=11,
+        title_size=14,
+        leading=14,
+        margin=36,
+        columns=2,
+        gutter=18,
+    ):
+        self.pagesize = pagesize
+        self.font_size = font_size
+        self.title_size = title_size
+        self.leading = leading
+        self.margin = margin
+        self.columns = columns
+        self.gutter = gutter
+
+        width, height = pagesize
+        self.column_width = (
+            width - 2 * margin - gutter * (columns - 1)
+        ) / columns
+        self.top = height - margin
+        self.lines_per_column = int(
+            (height - 2 * margin - title_size - leading) // leading
+        )
+
+    def fit(self, line):
+        """Обрезает строку с многоточием, если она не влезает в колонку."""
+        width = pdfmetrics.stringWidth(line, FONT_NAME, self.font_size)
+        if width <= self.column_width:
+
+            return line
+
+        while line and pdfmetrics.stringWidth(
+            line + '…', FONT_NAME, self.font_size
+        ) > self.column_width:
+            line = line[:-1]
+
+        return line + '…'
+
+    def render(self, lines, title=''):
+        """Возвращает pdf документ байтами."""
+        register_fonts()
+
+        buffer = io.BytesIO()
+        pdf_file = canvas.Canvas(buffer, pagesize=self.pagesize)
+        lines = list(lines)
+        per_page = self.lines_per_column * self.columns
+        pages = max(1, -(-len(lines) // per_page))
+
+        for page in range(pages):
+            self.draw_header(pdf_file, title, page + 1, pages)
+            page_lines = lines[page * per_page:(page + 1) * per_page]
+
+            for column in range(self.columns):
+                column_lines = page_lines[
+                    column * self.lines_per_column:
+                    (column + 1) * self.lines_per_column
+                ]
+                if not column_lines:
+                    break
+
+                text = pdf_file.beginText(
+                    self.margin + column * (self.column_width + self.gutter),
+                    self.top - self.title_size - self.leading,
+                )
+                text.setFont(FONT_NAME, self.font_size, self.leading)
+                for line in column_lines:
+                    text.textLine(self.fit(line))
+                pdf_file.drawText(text)
+
+            pdf_file.showPage()
+
+        pdf_file.save()
+
+        return buffer.getvalue()
+
+    def draw_header(self, pdf_file, title, page, pages):
+        width, height = self.pagesize
+        pdf_file.setFont(FONT_NAME, self.title_size)
+        pdf_file.drawCentredString(width / 2, self.top, title)
+
+        if pages > 1:
+            pdf_file.setFont(FONT_NAME, self.font_size - 2)
+            pdf_file.drawRightString(
+                width - self.margin,
+                self.margin / 2,
+                f'{page} / {pages}',
+            )
+
+
+shopping_list_renderer = ListPDFRenderer()
+
+
+def render_shopping_list(items):
+    """Pdf со списком покупок из строк shopping_list.ShoppingListItem."""
+
+    return shopping_list_renderer.render(
+        (
+            '{name} - {amount} {unit}'.format(
+                name=item.name,
+                amount=item.amount,
+                unit=item.measurement_unit,
+            )
+            for item in items
+        ),
+        title='Мой список покупок',
+    )
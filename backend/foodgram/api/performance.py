@@ -0,0 +1,215 @@
+"""
+Замеры запроса: число запросов в БД и их время, время сериализации
+(serialize) и рендера ответа (render), время вью и всего запроса.
+Итоги уходят в заголовок Server-Timing, запросы дольше SLOW_REQUEST_MS
+пишутся в лог одной JSON строкой с самыми частыми SQL (без параметров)
+- так видны N+1. Замеры пересекаются: view включает serialize,
+serialize - запросы из полей сериализатора.
+
+Замеры лежат в contextvar: он доходит и до потоков sync_to_async,
+поэтому запросы асинхронных вью тоже учитываются. Тело
+StreamingHttpResponse читается уже после middleware, и запросы
+во время его отдачи (файл списка покупок) в замеры не попадают.
+"""
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+current_timings = ContextVar('current_timings', default=None)
+
+IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL без значений: списки IN (...), числа и строки заменены."""
+
+    sql = IN_LIST.sub('(...)', sql)
+    sql = LITERAL.sub('?', sql)
+
+    return SPACES.sub(' ', sql).strip()
+
+
+class RequestTimings:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_name = None
+        self.queries = []
+        self.db_time = 0.0
+        self.spans = Counter()
+        self.active = set()
+
+    def add_query(self, sql, duration):
+        self.queries.append(sql)
+        self.db_time += duration
+
+    def top_queries(self, limit=5):
+        counts = Counter(fingerprint(sql) for sql in self.queries)
+
+        return [
+            {'sql': sql, 'count': count}
+            for sql, count in counts.most_common(limit)
+            if count > 1
+        ]
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка из connection.execute_wrappers для всех соединений."""
+
+    timings = current_timings.get()
+    if timings is None:
+
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(sql, time.perf_counter() - start)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # connection_created приходит и на каждое соединение из пула.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed(name):
+    """
+    Добавляет время блока к замеру name текущего запроса.
+    Вложенный блок с тем же name уже учтён во внешнем.
+    """
+
+    timings = current_timings.get()
+    if timings is None or name in timings.active:
+        yield
+
+        return
+
+    timings.active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.active.discard(name)
+        timings.spans[name] += time.perf_counter() - start
+
+
+class TimedSerializerMixin:
+    """
+    Время to_representation сериализатора попадает в замер serialize.
+    Для many=True замеряется каждый объект, сама выборка списка
+    остаётся в db.
+    """
+
+    def to_representation(self, instance):
+        with timed('serialize'):
+
+            return super().to_representation(instance)
+
+
+class PerformanceMiddleware:
+    """
+    Замеры запроса. Работает и в синхронном, и в асинхронном стеке,
+    чтобы под ASGI не переводить асинхронные вью в поток.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Как в MiddlewareMixin: Django будет ждать корутину.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+
+            return self.__acall__(request)
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+
+        return self.finish(request, response, timings)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = current_timings.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+            timings.view_name = (
+                request.resolver_match.view_name
+                if request.resolver_match else view_func.__name__
+            )
+
+    async def aprocess_view(self, request, *args):
+        PerformanceMiddleware.process_view(self, request, *args)
+
+    def finish(self, request, response, timings):
+        finished = time.perf_counter()
+        total = finished - timings.started
+        metrics = [
+            ('db', timings.db_time, f'{len(timings.queries)} queries'),
+            *(
+                (name, duration, None)
+                for name, duration in timings.spans.items()
+            ),
+        ]
+        if timings.view_started is not None:
+            metrics.append(('view', finished - timings.view_started, None))
+        metrics.append(('total', total, None))
+
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = ', '.join(
+                f'{name};dur={duration * 1000:.1f}'
+                + (f';desc="{description}"' if description else '')
+                for name, duration, description in metrics
+            )
+
+        if (
+            settings.SLOW_REQUEST_MS
+            and total * 1000 >= settings.SLOW_REQUEST_MS
+        ):
+            logger.warning('slow request %s', json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': timings.view_name,
+                'status': response.status_code,
+                'queries': len(timings.queries),
+                **{
+                    f'{name}_ms': round(duration * 1000, 1)
+                    for name, duration, _ in metrics
+                },
+                'repeated_sql': timings.top_queries(),
+            }, ensure_ascii=False))
+
+        return response
@@ -0,0 +1,180 @@
+"""
+Планы горячих запросов API: лента рецептов, фильтры RecipeFilter,
+подписки и список покупок. Используется командой checkplans и тестом
+api.tests.test_plans - ни один запрос не должен читать большую таблицу
+полным проходом. Работает на PostgreSQL и SQLite.
+"""
+import json
+import random
+import re
+
+from django.db import connection
+from django.test import RequestFactory
+
+from .filters import RecipeFilter
+from .shopping_list import shopping_list_queryset
+from .utils import KeysetPagination
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientAmount,
+    Recipe,
+    ShoppingCart,
+    Subscription,
+    Tag,
+    User,
+)
+
+# Маленькие справочники, для них полный проход по таблице нормален.
+SMALL_TABLES = {'recipes_tag'}
+
+
+def seed_dataset(users=300, recipes=3000, ingredients=2000, seed=1):
+    """
+    Данные с перекосом, как в жизни, и ANALYZE для планировщика.
+    Возвращает пользователя, от имени которого строятся запросы.
+    """
+
+    rng = random.Random(seed)
+    user_objects = User.objects.bulk_create(
+        User(username=f'plan_user_{index}', email=f'plan{index}@plan.io')
+        for index in range(users)
+    )
+    tags = Tag.objects.bulk_create(
+        Tag(name=f'plan tag {index}', color='#000', slug=f'plan-{index}')
+        for index in range(8)
+    )
+    ingredient_objects = Ingredient.objects.bulk_create(
+        Ingredient(name=f'plan ingredient {index}', measurement_unit='г')
+        for index in range(ingredients)
+    )
+    # Немногие авторы пишут большую часть рецептов.
+    authors = rng.choices(
+        user_objects,
+        weights=[1 / (rank + 1) for rank in range(users)],
+        k=recipes,
+    )
+    recipe_objects = Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f'plan recipe {index}',
+            image='recipes/images/plan.png',
+            text='plan text',
+            cooking_time=rng.randint(1, 120),
+        )
+        for index, author in enumerate(authors)
+    )
+
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for recipe in recipe_objects
+        for tag in rng.sample(tags, 2)
+    )
+    IngredientAmount.objects.bulk_create(
+        IngredientAmount(recipe=recipe, ingredient=ingredient, amount=10)
+        for recipe in recipe_objects
+        for ingredient in rng.sample(ingredient_objects, 6)
+    )
+    for model in (Favorite, ShoppingCart):
+        model.objects.bulk_create(
+            model(user=user, recipe=recipe)
+            for user in user_objects
+            for recipe in rng.sample(recipe_objects, 10)
+        )
+    Subscription.objects.bulk_create(
+        Subscription(user=user, author=author)
+        for user in user_objects
+        for author in rng.sample(user_objects, 10)
+        if author != user
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    return user_objects[0]
+
+
+def get_queries(user):
+    """(имя, queryset) горячих запросов API от имени user."""
+
+    request = RequestFactory().get('/api/recipes/')
+    request.user = user
+    feed = Recipe.objects.with_related()
+    page = list(feed[:6])
+    recipe_ids = [recipe.pk for recipe in page]
+
+    def recipe_filter(**params):
+        return RecipeFilter(params, feed, request=request).qs[:6]
+
+    keyset = KeysetPagination()
+    position = [
+        keyset.get_value(page[-1], field) for field in keyset.ordering
+    ]
+    authors = User.objects.filter(subscribe_author__user=user)
+    author_ids = list(authors.values_list('pk', flat=True))
+
+    return [
+        ('recipe feed', feed[:6]),
+        ('recipe detail', feed.filter(pk=recipe_ids[0])),
+        ('feed tags prefetch', Tag.objects.filter(
+            recipes__in=recipe_ids
+        )),
+        ('feed ingredients prefetch', IngredientAmount.objects.filter(
+            recipe__in=recipe_ids
+        ).select_related('ingredient')),
+        ('feed keyset page', feed.order_by(*keyset.ordering).filter(
+            keyset.after(position)
+        )[:6]),
+        ('filter author', recipe_filter(author=user.pk)),
+        ('filter tags', recipe_filter(tags=['plan-1', 'plan-2'])),
+        ('filter favorited', recipe_filter(is_favorited=True)),
+        ('filter shopping cart', recipe_filter(is_in_shopping_cart=True)),
+        ('user favorites', Favorite.objects.filter(
+            user=user
+        ).values_list('recipe_id')),
+        ('user shopping cart', ShoppingCart.objects.filter(
+            user=user
+        ).values_list('recipe_id')),
+        ('user subscriptions', Subscription.objects.filter(
+            user=user
+        ).values_list('author_id')),
+        ('subscriptions', authors.order_by('id')[:6]),
+        ('subscriptions recipes', Recipe.objects.latest_per_author(
+            author_ids[:6], 3
+        )),
+        ('shopping list', shopping_list_queryset(user)),
+    ]
+
+
+def explain(queryset):
+    """Текст плана и таблицы, которые читаются полным проходом."""
+
+    if connection.vendor == 'postgresql':
+        plan = json.loads(queryset.explain(format='json'))
+        scans = [
+            node['Relation Name']
+            for node in walk(plan[0]['Plan'])
+            if node['Node Type'] == 'Seq Scan'
+            and node['Relation Name'] not in SMALL_TABLES
+        ]
+
+        return json.dumps(plan, indent=2), scans
+
+    plan = queryset.explain()
+    # Проход по подзапросу из FROM - это не таблица.
+    derived = set(re.findall(r'(?:CO-ROUTINE|MATERIALIZE) (\S+)', plan))
+    scans = []
+    for line in plan.splitlines():
+        match = re.search(r'\bSCAN (\S+)(.*)$', line)
+        if match and 'USING' not in match.group(2) and (
+            match.group(1) not in SMALL_TABLES | derived
+        ):
+            scans.append(match.group(1))
+
+    return plan, scans
+
+
+def walk(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from walk(child)
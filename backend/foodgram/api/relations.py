@@ -0,0 +1,138 @@
+"""
+Связи текущего пользователя: id рецептов в избранном и в списке
+покупок, id авторов в подписках. Загружаются один раз на запрос
+(тремя запросами или из кэша Django), флаги is_favorited,
+is_in_shopping_cart и is_subscribed проверяются по множествам.
+
+В кэше наборы лежат под поколением user:<id> (см. response_cache),
+которое сдвигается при каждом изменении связей пользователя.
+"""
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .response_cache import bump_generations, get_generations
+from recipes.models import Favorite, ShoppingCart, Subscription
+
+RELATIONS_KEY = 'user_relations:{user_id}:{generation}'
+
+
+class UserRelations(NamedTuple):
+    favorites: frozenset
+    shopping_cart: frozenset
+    following: frozenset
+
+
+EMPTY_RELATIONS = UserRelations(frozenset(), frozenset(), frozenset())
+
+
+def relation_querysets(user_id):
+
+    return (
+        Favorite.objects.filter(
+            user_id=user_id
+        ).values_list('recipe_id', flat=True),
+        ShoppingCart.objects.filter(
+            user_id=user_id
+        ).values_list('recipe_id', flat=True),
+        Subscription.objects.filter(
+            user_id=user_id
+        ).values_list('author_id', flat=True),
+    )
+
+
+def load_relations(user_id):
+
+    return UserRelations(*(
+        frozenset(queryset) for queryset in relation_querysets(user_id)
+    ))
+
+
+async def aload_relations(user_id):
+    sets = []
+    for queryset in relation_querysets(user_id):
+        sets.append(frozenset([pk async for pk in queryset]))
+
+    return UserRelations(*sets)
+
+
+def get_cached_relations(user_id):
+    generation, = get_generations([f'user:{user_id}'])
+    key = RELATIONS_KEY.format(user_id=user_id, generation=generation)
+    relations = cache.get(key)
+    if relations is None:
+        relations = load_relations(user_id)
+        cache.set(key, relations, settings.USER_RELATIONS_CACHE_TIMEOUT)
+
+    return relations
+
+
+def get_user_relations(request):
+    """Связи пользователя запроса, для анонима - пустые."""
+
+    if request is None or request.user.is_anonymous:
+
+        return EMPTY_RELATIONS
+
+    relations = getattr(request, 'user_relations', None)
+    if relations is None:
+        if settings.USER_RELATIONS_CACHE_TIMEOUT:
+            relations = get_cached_relations(request.user.pk)
+        else:
+            relations = load_relations(request.user.pk)
+        request.user_relations = relations
+
+    return relations
+
+
+async def aget_user_relations(request):
+    """get_user_relations для асинхронных вью, запросы - async ORM."""
+
+    if request is None or request.user.is_anonymous:
+
+        return EMPTY_RELATIONS
+
+    relations = getattr(request, 'user_relations', None)
+    if relations is not None:
+
+        return relations
+
+    user_id = request.user.pk
+    if settings.USER_RELATIONS_CACHE_TIMEOUT:
+        generation, = await sync_to_async(
+            get_generations, thread_sensitive=False
+        )([f'user:{user_id}'])
+        key = RELATIONS_KEY.format(user_id=user_id, generation=generation)
+        relations = await cache.aget(key)
+        if relations is None:
+            relations = await aload_relations(user_id)
+            await cache.aset(
+                key, relations, settings.USER_RELATIONS_CACHE_TIMEOUT
+            )
+    else:
+        relations = await aload_relations(user_id)
+    request.user_relations = relations
+
+    return relations
+
+
+def bump_relations(*user_ids):
+    """Связи пользователей изменились (после коммита транзакции)."""
+
+    bump_generations(*(f'user:{user_id}' for user_id in user_ids))
+
+
+def overlay_recipe(recipe, relations):
+    """Флаги пользователя поверх общего для всех тела рецепта."""
+
+    return {
+        **recipe,
+        'author': {
+            **recipe['author'],
+            'is_subscribed': recipe['author']['id'] in relations.following,
+        },
+        'is_favorited': recipe['id'] in relations.favorites,
+        'is_in_shopping_cart': recipe['id'] in relations.shopping_cart,
+    }
@@ -0,0 +1,116 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from . import pdf
+from .performance import timed
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer, время рендера попадает в Server-Timing."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render'):
+
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """
+    Базовый рендерер списка покупок.
+    data - строки из shopping_list (ShoppingListItem).
+    stream() отдаёт файл частями для StreamingHttpResponse,
+    render() собирает его целиком. Текстовые форматы описывают строки
+    файла в lines(), в ответ они идут кусками около chunk_size символов.
+    """
+
+    charset = 'utf-8'
+    extension = None
+    chunk_size = 64 * 1024
+
+    def lines(self, items):
+        raise NotImplementedError
+
+    def stream(self, items):
+        buffer = []
+        size = 0
+
+        for line in self.lines(items):
+            buffer.append(line)
+            size += len(line)
+            if size >= self.chunk_size:
+                yield ''.join(buffer).encode(self.charset)
+                buffer = []
+                size = 0
+
+        if buffer:
+            yield ''.join(buffer).encode(self.charset)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+
+        return b''.join(self.stream(data))
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    """PDF собирается reportlab целиком, поэтому отдаётся одним куском."""
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    extension = 'pdf'
+    charset = None
+
+    def stream(self, items):
+        yield pdf.render_shopping_list(items)
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    extension = 'txt'
+
+    def lines(self, items):
+        for item in items:
+            yield '{name} - {amount} {unit}\n'.format(
+                name=item.name,
+                amount=item.amount,
+                unit=item.measurement_unit,
+            )
+
+
+class Echo:
+    """Псевдо-файл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    extension = 'csv'
+
+    def lines(self, items):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'amount', 'measurement_unit'))
+
+        for item in items:
+            yield writer.writerow(
+                (item.name, item.amount, item.measurement_unit)
+            )
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    extension = 'json'
+
+    def lines(self, items):
+        separator = '['
+
+        for item in items:
+            yield separator + json.dumps(item._asdict(), ensure_ascii=False)
+            separator = ','
+
+        yield '[]' if separator == '[' else ']'
@@ -0,0 +1,194 @@
+"""
+Общий кэш ответов на анонимные GET запросы рецептов, тэгов
+и ингредиентов. Хранится в кэше Django (CACHES), ключ - хост, путь,
+отсортированные параметры запроса и поколения данных, от которых
+зависит ответ. Запись в данные сдвигает поколение, и все зависящие
+от него ответы перестают находиться по ключу - TTL только ограничивает
+время жизни уже ненужных записей.
+
+Поколения:
+recipes - список рецептов, recipe:<id> - один рецепт,
+tags, ingredients, authors - справочники внутри ответов.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+GENERATION_KEY = 'response_cache:generation:{name}'
+RESPONSE_KEY = 'response_cache:response:{digest}'
+
+# Ответы о рецептах включают тэги, ингредиенты и авторов.
+RECIPE_DEPENDENCIES = ('tags', 'ingredients', 'authors')
+
+# Поля автора в ответах о рецептах (CustomUserSerializer).
+AUTHOR_FIELDS = frozenset(('email', 'username', 'first_name', 'last_name'))
+
+
+def get_generations(names):
+    """Текущие поколения одним запросом в кэш, недостающие заводятся."""
+
+    keys = [GENERATION_KEY.format(name=name) for name in names]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            generations[key] = cache.get_or_set(
+                key, time.time_ns, timeout=None
+            )
+
+    return [generations[key] for key in keys]
+
+
+def bump_generations(*names):
+    """Сдвигает поколения после коммита текущей транзакции."""
+
+    def bump():
+        for name in names:
+            key = GENERATION_KEY.format(name=name)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def bump_recipes(*recipe_ids):
+    """Рецепты изменились: сбрасываются их страницы и список."""
+
+    bump_generations(
+        'recipes', *(f'recipe:{recipe_id}' for recipe_id in recipe_ids)
+    )
+
+
+def make_key(request, dependencies):
+    params = sorted(
+        (name, sorted(values))
+        for name, values in request.query_params.lists()
+    )
+    generations = get_generations(dependencies)
+    digest = hashlib.md5(
+        repr((
+            request.get_host(), request.path, params, generations
+        )).encode()
+    ).hexdigest()
+
+    return RESPONSE_KEY.format(digest=digest)
+
+
+class AnonymousCacheMixin:
+    """
+    Кэширует list и retrieve вьюсета для анонимных пользователей.
+    cache_dependencies - поколения, от которых зависит ответ,
+    get_cache_dependencies можно переопределить для retrieve.
+    Если ответ отличается от анонимного только флагами пользователя,
+    shares_anonymous_cache разрешает брать его из того же кэша,
+    а personalize проставляет флаги (без пользователя - сбрасывает).
+    """
+
+    cache_dependencies = ()
+
+    def get_cache_dependencies(self):
+
+        return self.cache_dependencies
+
+    def shares_anonymous_cache(self, request):
+
+        return False
+
+    def personalize(self, data, request):
+
+        return data
+
+    def list(self, request, *args, **kwargs):
+
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, method, request, *args, **kwargs):
+        if not (
+            request.user.is_anonymous or self.shares_anonymous_cache(request)
+        ):
+
+            return method(request, *args, **kwargs)
+
+        key = make_key(request, self.get_cache_dependencies())
+        data = cache.get(key)
+        if data is not None:
+
+            return Response(
+                self.personalize(data, request),
+                headers={'X-Response-Cache': 'hit'},
+            )
+
+        response = method(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(
+                key,
+                self.personalize(response.data, None),
+                settings.RESPONSE_CACHE_TIMEOUT,
+            )
+        response['X-Response-Cache'] = 'miss'
+
+        return response
+
+
+def recipe_saved(sender, instance, **kwargs):
+    bump_recipes(instance.pk)
+
+
+def recipe_tags_changed(sender, instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+
+        return
+
+    if reverse:
+        # Рецепты поменялись со стороны тэга - проще сбросить все.
+        bump_generations('tags')
+    else:
+        bump_recipes(instance.pk)
+
+
+def tag_saved(sender, **kwargs):
+    bump_generations('tags')
+
+
+def ingredient_saved(sender, **kwargs):
+    bump_generations('ingredients')
+
+
+def user_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Поколение authors сдвигается, только если у пользователя есть рецепты
+    и поменялись поля, которые попадают в ответы о рецептах. Регистрация,
+    вход и смена пароля кэш ответов не сбрасывают. Удаление пользователя
+    удаляет его рецепты, и их сбрасывает recipe_saved.
+    """
+    if raw or instance.pk is None:
+
+        return
+
+    fields = AUTHOR_FIELDS
+    if update_fields is not None:
+        fields = AUTHOR_FIELDS.intersection(update_fields)
+    if not fields:
+
+        return
+
+    stored = sender.objects.filter(
+        pk=instance.pk, recipes__isnull=False
+    ).values(*fields).first()
+    if stored is None:
+
+        return
+
+    if any(getattr(instance, name) != stored[name] for name in fields):
+        bump_generations('authors')
@@ -1,22 +1,44 @@
 from djoser.serializers import UserSerializer, UserCreateSerializer
 from django.db import transaction
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
 from . import helpers
+from .export_cache import bump_cart_version
+from .performance import TimedSerializerMixin
+from .relations import get_user_relations
+from .response_cache import bump_recipes
+from .uploads import RecipeImageField
 from recipes.models import (
+    AuthorStats,
     Ingredient,
     IngredientAmount,
-    Favorite,
     Recipe,
     ShoppingCart,
     Subscription,
     Tag,
     User,
 )
+from recipes import counters
+from recipes.renditions import (
+    FIELDS as RENDITION_FIELDS,
+    rendition_url,
+    schedule_renditions,
+)
+from recipes.search import update_search_index
+
+
+def absolute_url(serializer, url):
+    """Как у ImageField: абсолютный URL, если в контексте есть запрос."""
+
+    request = serializer.context.get('request')
+    if request is not None:
+
+        return request.build_absolute_uri(url)
 
+    return url
 
-class CustomUserSerializer(UserSerializer):
+
+class CustomUserSerializer(TimedSerializerMixin, UserSerializer):
     """
     Кастомный сериализатор для корректной работы djoser
     при авторизации с парой пароль + имейл.
@@ -25,14 +47,13 @@ class CustomUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     def get_is_subscribed(self, author):
+        if hasattr(author, 'is_subscribed'):
 
-        try:
-            user = self.context['request'].user
+            return author.is_subscribed
 
-            return user.subscribe_user.filter(author=author).exists()
-        except AttributeError:
+        relations = get_user_relations(self.context.get('request'))
 
-            return False
+        return author.pk in relations.following
 
     class Meta:
         model = User
@@ -59,7 +80,7 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         )
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для модели тегов"""
 
     class Meta:
@@ -67,7 +88,7 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'color', 'slug',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Сериалзизатор для модели ингредиентов.
     """
@@ -77,7 +98,10 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', )
 
 
-class IngredientWithAmountSerializer(serializers.ModelSerializer):
+class IngredientWithAmountSerializer(
+    TimedSerializerMixin,
+    serializers.ModelSerializer
+):
     """
     Сериализатор для ингредиентов с данными из промежуточной
     модели о количестве ингредента в рецепте.
@@ -133,7 +157,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         many=True,
     )
     author = UserSerializer(required=False)
-    image = Base64ImageField(required=True, allow_null=False)
+    image = RecipeImageField(required=True, allow_null=False)
 
     class Meta:
         model = Recipe
@@ -155,23 +179,62 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
         recipe = Recipe(**validated_data)
         recipe.save()
+        counters.change_author_counters(recipe.author_id, recipes=1)
+        helpers.set_tags_ingredients(recipe, ingredients, tags)
+        update_search_index(recipe.pk)
+        schedule_renditions(recipe.pk)
 
-        return helpers.set_tags_ingredients(recipe, ingredients, tags)
+        return recipe
 
     @transaction.atomic
     def update(self, recipe, validated_data):
-        ingredients = validated_data.pop('ingredient_amount')
-        tags = validated_data.pop('tags')
-
-        for field, value in validated_data.items():
-            setattr(recipe, field, value)
+        """
+        Пишет только изменения: изменённые поля рецепта, тэги,
+        если набор другой, и разницу в ингредиентах.
+        """
+        ingredients = validated_data.pop('ingredient_amount', None)
+        tags = validated_data.pop('tags', None)
+
+        changed_fields = [
+            field for field, value in validated_data.items()
+            if getattr(recipe, field) != value
+        ]
+        for field in changed_fields:
+            setattr(recipe, field, validated_data[field])
+        if 'image' in changed_fields:
+            # Старые копии картинки больше не подходят.
+            for field in RENDITION_FIELDS:
+                setattr(recipe, field, '')
+            changed_fields.extend(RENDITION_FIELDS)
+        if changed_fields:
+            recipe.save(update_fields=changed_fields)
+
+        tags_changed = (
+            tags is not None and helpers.update_tags(recipe, tags)
+        )
+        ingredients_changed = (
+            ingredients is not None
+            and helpers.update_ingredients(recipe, ingredients)
+        )
 
-        IngredientAmount.objects.filter(recipe=recipe).delete()
+        if ingredients_changed:
+            # bulk-запросы не шлют сигналов, кэш ответов сбрасываем сами.
+            bump_recipes(recipe.pk)
+            bump_cart_version(*recipe.shopping_cart.values_list(
+                'user_id', flat=True
+            ))
+        if (
+            tags_changed or ingredients_changed
+            or {'name', 'text'} & set(changed_fields)
+        ):
+            update_search_index(recipe.pk)
+        if 'image' in changed_fields:
+            schedule_renditions(recipe.pk)
 
-        return helpers.set_tags_ingredients(recipe, ingredients, tags)
+        return recipe
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Сериализатор для рецептов. Обычный.
     """
@@ -180,37 +243,32 @@ class RecipeSerializer(serializers.ModelSerializer):
     tags = TagSerializer(read_only=True, many=True)
     ingredients = serializers.SerializerMethodField()
     author = CustomUserSerializer(required=False)
-    image = Base64ImageField(required=True)
+    image = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
     def get_is_in_shopping_cart(self, obj):
+        relations = get_user_relations(self.context.get('request'))
 
-        try:
-
-            return ShoppingCart.objects.filter(
-                recipe=obj, user=self.context['request'].user
-            ).exists()
-
-        except TypeError:
-
-            return False
+        return obj.pk in relations.shopping_cart
 
     def get_is_favorited(self, obj):
-        try:
+        relations = get_user_relations(self.context.get('request'))
+
+        return obj.pk in relations.favorites
 
-            return Favorite.objects.filter(
-                recipe=obj, user=self.context['request'].user
-            ).exists()
+    def get_image(self, recipe):
+        # В списке карточки, на странице рецепта - большая копия.
+        if isinstance(self.parent, serializers.ListSerializer):
 
-        except TypeError:
+            return absolute_url(self, rendition_url(recipe, 'card'))
 
-            return False
+        return absolute_url(self, rendition_url(recipe, 'full'))
 
     def get_ingredients(self, recipe):
 
         return IngredientWithAmountSerializer(
-            IngredientAmount.objects.filter(recipe=recipe).all(),
+            recipe.ingredient_amount.all(),
             many=True
         ).data
 
@@ -240,17 +298,43 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class RecipeForSubSerializer(serializers.ModelSerializer):
+class RecipeForSubSerializer(
+    TimedSerializerMixin,
+    serializers.ModelSerializer
+):
     """
     Сериализатор для рецепта. Короткий.
     """
 
+    image = serializers.SerializerMethodField()
+
+    def get_image(self, recipe):
+
+        return absolute_url(self, rendition_url(recipe, 'thumbnail'))
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
-class SubscribeSerializer(serializers.ModelSerializer):
+class RecipeIdsSerializer(serializers.Serializer):
+    """
+    Список id рецептов для пакетного добавления и удаления
+    в избранное и список покупок.
+    """
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+
+    def validate_recipes(self, recipes):
+
+        return list(dict.fromkeys(recipes))
+
+
+class SubscribeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Сериализатор для подписок на пользователей.
     """
@@ -265,24 +349,33 @@ class SubscribeSerializer(serializers.ModelSerializer):
     recipes_count = serializers.SerializerMethodField()
 
     def get_is_subscribed(self, author):
+        if hasattr(author, 'is_subscribed'):
 
-        try:
-            user = self.context['request'].user
-
-            return user.subscribe_user.filter(author=author).exists()
+            return author.is_subscribed
 
-        except AttributeError:
+        relations = get_user_relations(self.context.get('request'))
 
-            return False
+        return author.pk in relations.following
 
     def get_recipes(self, obj):
-        recipes = obj.recipes
+        if hasattr(obj, 'recipes_preview'):
+            recipes = obj.recipes_preview
+        else:
+            recipes = obj.recipes.all()
 
         return RecipeForSubSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+
+            return obj.recipes_count
+
+        try:
+
+            return obj.stats.recipes_count
+        except AuthorStats.DoesNotExist:
 
-        return obj.recipes.count()
+            return 0
 
     class Meta:
         model = Subscription
@@ -0,0 +1,50 @@
+from typing import NamedTuple
+
+from django.db.models import Sum
+
+from recipes.models import IngredientAmount
+
+
+class ShoppingListItem(NamedTuple):
+    """Одна строка списка покупок: ингредиент и суммарное количество."""
+
+    ingredient_id: int
+    name: str
+    measurement_unit: str
+    amount: int
+
+
+def shopping_list_queryset(user):
+    """
+    Количества суммируются на стороне БД:
+    GROUP BY ingredient_id, measurement_unit по IngredientAmount
+    рецептов из корзины пользователя.
+    """
+
+    return IngredientAmount.objects.filter(
+        recipe__shopping_cart__user=user,
+    ).values_list(
+        'ingredient_id',
+        'ingredient__name',
+        'ingredient__measurement_unit',
+    ).annotate(
+        total=Sum('amount'),
+    ).order_by('ingredient__name', 'ingredient__measurement_unit')
+
+
+def iter_shopping_list(user, chunk_size=2000):
+    """
+    Список покупок пользователя одним запросом.
+    Строки читаются из курсора порциями, без загрузки всего списка.
+    """
+
+    rows = shopping_list_queryset(user)
+
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield ShoppingListItem(*row)
+
+
+def get_shopping_list(user):
+    """Весь список покупок пользователя списком ShoppingListItem."""
+
+    return list(iter_shopping_list(user))
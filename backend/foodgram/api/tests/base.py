@@ -0,0 +1,124 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache
+from api.export_cache import export_cache
+from recipes.models import Recipe, Tag, User
+
+ADMIN_URL = '/admin/recipes/recipe/'
+
+
+class ApiTestCase(TestCase):
+    """
+    Кэши процесса (кэш Django, готовые файлы списка покупок, токены) общие
+    для всех тестов, поэтому каждый тест начинает с пустых.
+    """
+
+    def setUp(self):
+        cache.clear()
+        export_cache.clear()
+        token_cache.clear()
+        self.anon = APIClient()
+
+    @staticmethod
+    def create_user(username):
+
+        return User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='test-password',
+            first_name=username.title(),
+            last_name='Test',
+        )
+
+    @staticmethod
+    def create_recipe(author, name='Рецепт', tags=()):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=name,
+            image='recipes/images/test.png',
+            text='Шаги',
+            cooking_time=10,
+        )
+        recipe.tags.set(tags)
+
+        return recipe
+
+    @staticmethod
+    def client_for(user):
+        client = APIClient()
+        client.force_authenticate(user)
+
+        return client
+
+
+def make_image(name='recipe.png', color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+class AdminTestCase(ApiTestCase):
+    """Админка рецептов с картинками во временном MEDIA_ROOT."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.media = override_settings(
+            MEDIA_ROOT=cls.media_root, IMAGE_RENDITIONS_ASYNC=False
+        )
+        cls.media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='test-password',
+        )
+        cls.author = cls.create_user('author')
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def recipe_form(self, author, **fields):
+
+        return {
+            'author': author.pk,
+            'name': 'Рецепт из админки',
+            'text': 'Шаги',
+            'cooking_time': 10,
+            'tags': [self.tag.pk],
+            'ingredient_amount-TOTAL_FORMS': 0,
+            'ingredient_amount-INITIAL_FORMS': 0,
+            **fields,
+        }
+
+    def add_recipe(self, author):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'{ADMIN_URL}add/',
+                self.recipe_form(author, image=make_image()),
+            )
+        self.assertEqual(response.status_code, 302)
+
+        return Recipe.objects.latest('pk')
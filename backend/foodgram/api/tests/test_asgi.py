@@ -0,0 +1,93 @@
+from django.core.handlers.asgi import ASGIHandler
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+
+from api.tests.base import ApiTestCase
+from recipes.models import Ingredient, IngredientAmount, ShoppingCart
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+
+
+@override_settings(ROOT_URLCONF='foodgram.asgi_urls')
+class AsgiDownloadTest(ApiTestCase):
+    """
+    Скачивание списка покупок через ASGIHandler, как под uvicorn:
+    тело ответа читается в потоке событийного цикла.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('user')
+        cls.token = Token.objects.create(user=cls.user)
+        recipe = cls.create_recipe(cls.create_user('author'))
+        for number in range(3):
+            IngredientAmount.objects.create(
+                recipe=recipe,
+                ingredient=Ingredient.objects.create(
+                    name=f'Ингредиент {number}', measurement_unit='г'
+                ),
+                amount=number + 1,
+            )
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        super().setUp()
+        # Как в AsyncClient: соединение теста живёт в транзакции.
+        for signal in (request_started, request_finished):
+            signal.disconnect(close_old_connections)
+            self.addCleanup(signal.connect, close_old_connections)
+
+    async def download(self, query, token=True):
+        messages = []
+        headers = [(b'host', b'testserver')]
+        if token:
+            headers.append(
+                (b'authorization', f'Token {self.token.key}'.encode())
+            )
+
+        async def receive():
+
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await ASGIHandler()({
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': DOWNLOAD_URL,
+            'query_string': query.encode(),
+            'headers': headers,
+        }, receive, send)
+
+        return messages[0]['status'], b''.join(
+            message.get('body', b'') for message in messages[1:]
+        )
+
+    async def test_full_body(self):
+        status, body = await self.download('format=txt')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body.decode(), (
+            'Ингредиент 0 - 1 г\n'
+            'Ингредиент 1 - 2 г\n'
+            'Ингредиент 2 - 3 г\n'
+        ))
+
+    async def test_cached_file(self):
+        first = await self.download('format=csv')
+        second = await self.download('format=csv')
+
+        self.assertEqual(first[0], 200)
+        self.assertEqual(first, second)
+
+    async def test_anonymous(self):
+        status, body = await self.download('format=txt', token=False)
+
+        self.assertEqual(status, 401)
+        self.assertIn(b'detail', body)
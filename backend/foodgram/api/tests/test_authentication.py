@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import authentication
+from api.authentication import TokenCache, shared_key, token_cache
+from api.tests.base import ApiTestCase
+
+ME_URL = '/api/users/me/'
+LOGOUT_URL = '/api/auth/token/logout/'
+
+
+class TokenAuthenticationTest(ApiTestCase):
+    """Пользователь токена из кэшей и сброс кэшей при выходе."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('user')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_logout_rejects_token(self):
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(LOGOUT_URL)
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+
+    def test_process_local_cache_skips_shared_tier(self):
+        self.client.get(ME_URL)
+
+        self.assertIsNone(cache.get(shared_key(self.token.key)))
+        self.assertEqual(token_cache.get(self.token.key), self.user)
+
+    def test_shared_cache_is_used(self):
+        with mock.patch.object(
+            authentication, 'cache_is_process_local', return_value=False
+        ):
+            self.client.get(ME_URL)
+            token_cache.clear()
+
+            with self.assertNumQueries(0):
+                user = authentication.get_token_user(self.token.key)
+
+        self.assertEqual(user, self.user)
+
+    def test_cached_user_is_copied(self):
+        authentication.get_token_user(self.token.key)
+
+        first = authentication.get_token_user(self.token.key)
+        second = authentication.get_token_user(self.token.key)
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+
+
+class TokenCacheTest(ApiTestCase):
+
+    def test_entries_expire(self):
+        tokens = TokenCache(max_entries=10, timeout=10)
+        user = self.create_user('user')
+
+        with mock.patch('api.authentication.time.monotonic', return_value=0):
+            tokens.set('key', user)
+        with mock.patch('api.authentication.time.monotonic', return_value=5):
+            self.assertEqual(tokens.get('key'), user)
+        with mock.patch('api.authentication.time.monotonic', return_value=11):
+            self.assertIsNone(tokens.get('key'))
+
+    def test_least_recently_used_is_evicted(self):
+        tokens = TokenCache(max_entries=2, timeout=10)
+        user = self.create_user('user')
+        tokens.set('a', user)
+        tokens.set('b', user)
+        tokens.get('a')
+        tokens.set('c', user)
+
+        self.assertIsNone(tokens.get('b'))
+        self.assertEqual(tokens.get('a'), user)
@@ -0,0 +1,178 @@
+from unittest import mock
+
+from api.export_cache import get_cart_version
+from api.tests.base import ApiTestCase
+from api.views import RecipeBatchView
+from recipes import counters
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+FAVORITE_URL = '/api/recipes/favorite/'
+CART_URL = '/api/recipes/shopping_cart/'
+
+
+class RecipeBatchTest(ApiTestCase):
+    """Пакетное добавление и удаление в избранное и список покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('user')
+        author = cls.create_user('author')
+        cls.recipes = [cls.create_recipe(author) for _ in range(3)]
+        cls.ids = [recipe.pk for recipe in cls.recipes]
+        cls.missing_id = max(cls.ids) + 100
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.user)
+
+    def statuses(self, response):
+        self.assertEqual(response.status_code, 200)
+
+        return {
+            result['id']: result['status']
+            for result in response.json()['results']
+        }
+
+    def test_add(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipes[0])
+
+        response = self.client.post(
+            FAVORITE_URL,
+            {'recipes': [*self.ids, self.ids[1], self.missing_id]},
+            format='json',
+        )
+
+        self.assertEqual(self.statuses(response), {
+            self.ids[0]: 'exists',
+            self.ids[1]: 'added',
+            self.ids[2]: 'added',
+            self.missing_id: 'not_found',
+        })
+        self.assertEqual(len(response.json()['results']), 4)
+        self.assertEqual(
+            set(Favorite.objects.filter(
+                user=self.user
+            ).values_list('recipe_id', flat=True)),
+            set(self.ids),
+        )
+        self.assertEqual(
+            list(Recipe.objects.filter(pk__in=self.ids).order_by(
+                'pk'
+            ).values_list('favorites_count', flat=True)),
+            [0, 1, 1],
+        )
+
+    def test_remove(self):
+        for recipe in self.recipes[:2]:
+            self.client.post(
+                f'/api/recipes/{recipe.pk}/shopping_cart/', format='json'
+            )
+
+        response = self.client.delete(
+            CART_URL, {'recipes': [*self.ids, self.missing_id]}, format='json'
+        )
+
+        self.assertEqual(self.statuses(response), {
+            self.ids[0]: 'removed',
+            self.ids[1]: 'removed',
+            self.ids[2]: 'missing',
+            self.missing_id: 'not_found',
+        })
+        self.assertFalse(ShoppingCart.objects.filter(user=self.user).exists())
+        self.assertEqual(
+            set(Recipe.objects.filter(pk__in=self.ids).values_list(
+                'shopping_carts_count', flat=True
+            )),
+            {0},
+        )
+
+    def run_concurrently(self, change):
+        """После проверки id, но до записи, change меняет список."""
+        get_recipes = RecipeBatchView.get_recipes
+
+        def checked_then_changed(view, request):
+            try:
+
+                return get_recipes(view, request)
+            finally:
+                change()
+
+        return mock.patch.object(
+            RecipeBatchView, 'get_recipes', checked_then_changed
+        )
+
+    def favorites_count(self, recipe):
+        recipe.refresh_from_db()
+
+        return recipe.favorites_count
+
+    def test_concurrent_add_is_not_counted_twice(self):
+        recipe = self.recipes[0]
+
+        def add():
+            Favorite.objects.create(user=self.user, recipe=recipe)
+            counters.change_recipe_counters(recipe.pk, favorites=1)
+
+        with self.run_concurrently(add):
+            response = self.client.post(
+                FAVORITE_URL, {'recipes': self.ids}, format='json'
+            )
+
+        self.assertEqual(self.statuses(response), {
+            self.ids[0]: 'exists',
+            self.ids[1]: 'added',
+            self.ids[2]: 'added',
+        })
+        self.assertEqual(
+            [self.favorites_count(recipe) for recipe in self.recipes],
+            [1, 1, 1],
+        )
+
+    def test_concurrent_remove_is_not_counted_twice(self):
+        recipe = self.recipes[0]
+        other = self.create_user('other')
+        for user in (self.user, other):
+            Favorite.objects.create(user=user, recipe=recipe)
+        counters.change_recipe_counters(recipe.pk, favorites=2)
+
+        def remove():
+            Favorite.objects.filter(user=self.user, recipe=recipe).delete()
+            counters.change_recipe_counters(recipe.pk, favorites=-1)
+
+        with self.run_concurrently(remove):
+            response = self.client.delete(
+                FAVORITE_URL, {'recipes': [recipe.pk]}, format='json'
+            )
+
+        self.assertEqual(self.statuses(response), {recipe.pk: 'missing'})
+        self.assertEqual(self.favorites_count(recipe), 1)
+
+    def test_cart_version_and_flags_change(self):
+        version = get_cart_version(self.user.pk)
+        recipe_url = f'/api/recipes/{self.ids[0]}/'
+        # Связи пользователя попадают в кэш.
+        self.assertFalse(
+            self.client.get(recipe_url).json()['is_in_shopping_cart']
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(CART_URL, {'recipes': self.ids}, format='json')
+
+        self.assertNotEqual(get_cart_version(self.user.pk), version)
+        recipe = self.client.get(recipe_url).json()
+        self.assertTrue(recipe['is_in_shopping_cart'])
+        self.assertFalse(recipe['is_favorited'])
+
+    def test_invalid_body(self):
+        for body in ({}, {'recipes': []}, {'recipes': list(range(1, 102))}):
+            with self.subTest(body=body):
+                response = self.client.post(
+                    FAVORITE_URL, body, format='json'
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_anonymous(self):
+        response = self.anon.post(
+            FAVORITE_URL, {'recipes': self.ids}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 401)
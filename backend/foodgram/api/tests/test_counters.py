@@ -0,0 +1,70 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from api.tests.base import ADMIN_URL, AdminTestCase, ApiTestCase
+from recipes.models import AuthorStats
+
+
+class AdminAuthorCountersTest(AdminTestCase):
+    """recipes_count авторов при правках рецептов в админке."""
+
+    def recipes_count(self, author):
+
+        return AuthorStats.objects.get(user=author).recipes_count
+
+    def test_add_and_delete(self):
+        recipe = self.add_recipe(self.author)
+        self.assertEqual(self.recipes_count(self.author), 1)
+
+        response = self.client.post(
+            f'{ADMIN_URL}{recipe.pk}/delete/', {'post': 'yes'}
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.recipes_count(self.author), 0)
+
+    def test_bulk_delete(self):
+        recipes = [self.add_recipe(self.author) for _ in range(3)]
+
+        response = self.client.post(ADMIN_URL, {
+            'action': 'delete_selected',
+            'post': 'yes',
+            '_selected_action': [recipe.pk for recipe in recipes[:2]],
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.recipes_count(self.author), 1)
+
+    def test_author_change(self):
+        other = self.create_user('other')
+        recipe = self.add_recipe(self.author)
+
+        response = self.client.post(
+            f'{ADMIN_URL}{recipe.pk}/change/', self.recipe_form(other)
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.recipes_count(self.author), 0)
+        self.assertEqual(self.recipes_count(other), 1)
+
+
+class RecountStatsTest(ApiTestCase):
+    """Рецепты в обход API (loaddata, ORM) чинит recountstats."""
+
+    def test_recipe_created_outside_api(self):
+        author = self.create_user('author')
+        self.create_recipe(author)
+        subscriptions = self.client_for(self.create_user('reader'))
+        subscriptions.post(f'/api/users/{author.pk}/subscribe/')
+
+        def recipes_count():
+            response = subscriptions.get('/api/users/subscriptions/')
+
+            return response.json()[0]['recipes_count']
+
+        self.assertEqual(recipes_count(), 0)
+
+        call_command('recountstats', stdout=StringIO())
+
+        self.assertEqual(recipes_count(), 1)
@@ -0,0 +1,103 @@
+import json
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from unittest import mock
+
+from django.utils import timezone
+
+from api.tests.base import ApiTestCase
+from api.utils import KeysetPagination
+from recipes.models import Recipe
+from recipes.search import update_search_index
+
+FEED_URL = '/api/recipes/'
+
+
+class KeysetPaginationTest(ApiTestCase):
+    """Курсорная пагинация ленты: ?cursor= и ссылка next."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user('author')
+        recipes = [
+            cls.create_recipe(cls.author, f'Суп {index}')
+            for index in range(15)
+        ]
+        # Рецепты с одной датой упорядочены по id.
+        now = timezone.now()
+        for index, recipe in enumerate(recipes[:5]):
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=now - timedelta(minutes=index)
+            )
+        Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in recipes[5:]]
+        ).update(pub_date=now - timedelta(hours=1))
+        update_search_index(*(recipe.pk for recipe in recipes))
+        cls.feed = list(Recipe.objects.values_list('id', flat=True))
+
+    def walk(self, url):
+        ids = []
+        pages = 0
+        while url:
+            response = self.anon.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertNotIn('count', data)
+            ids += [recipe['id'] for recipe in data['results']]
+            url = data['next']
+            pages += 1
+
+        return ids, pages
+
+    def test_pages_cover_feed_in_order(self):
+        ids, pages = self.walk(f'{FEED_URL}?cursor=&limit=4')
+
+        self.assertEqual(ids, self.feed)
+        self.assertEqual(pages, 4)
+
+    def test_next_page_does_not_shift_when_recipes_are_added(self):
+        first = self.anon.get(FEED_URL, {'cursor': '', 'limit': 4}).json()
+        self.create_recipe(self.author, 'Новый суп')
+
+        second = self.anon.get(first['next']).json()
+
+        self.assertEqual(
+            [recipe['id'] for recipe in second['results']], self.feed[4:8]
+        )
+
+    def test_invalid_cursor(self):
+        cursors = ['not-a-cursor'] + [
+            urlsafe_b64encode(json.dumps(position).encode()).decode()
+            for position in (
+                ['garbage', 1],
+                [{'a': 1}, 1],
+                [None, None],
+                ['2022-01-01T00:00:00+00:00', 'x'],
+                ['2022-01-01T00:00:00+00:00', [1]],
+                [1],
+            )
+        ]
+
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.anon.get(FEED_URL, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+    @mock.patch.object(KeysetPagination, 'max_page_size', 10)
+    def test_page_size_is_limited(self):
+        data = self.anon.get(FEED_URL, {'cursor': '', 'limit': 1000}).json()
+
+        self.assertEqual(len(data['results']), 10)
+        self.assertIsNotNone(data['next'])
+
+    def test_without_cursor_pages_are_numbered(self):
+        data = self.anon.get(FEED_URL, {'limit': 4}).json()
+
+        self.assertEqual(data['count'], len(self.feed))
+
+    def test_search_keeps_relevance_order(self):
+        data = self.anon.get(
+            FEED_URL, {'cursor': '', 'search': 'суп', 'limit': 4}
+        ).json()
+
+        self.assertEqual(data['count'], len(self.feed))
@@ -0,0 +1,37 @@
+from django.test import SimpleTestCase, override_settings
+
+from api.performance import RequestTimings, current_timings, timed
+from api.tests.base import ApiTestCase
+
+
+class TimedTest(SimpleTestCase):
+
+    def test_nested_span_is_counted_once(self):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            with timed('serialize'):
+                with timed('serialize'):
+                    pass
+        finally:
+            current_timings.reset(token)
+
+        self.assertEqual(list(timings.spans), ['serialize'])
+        self.assertFalse(timings.active)
+
+
+@override_settings(SERVER_TIMING=True)
+class ServerTimingTest(ApiTestCase):
+
+    def test_serialization_is_timed_apart_from_render(self):
+        self.create_recipe(self.create_user('author'))
+
+        response = self.anon.get('/api/recipes/?limit=6')
+
+        names = [
+            metric.split(';')[0]
+            for metric in response['Server-Timing'].split(', ')
+        ]
+        self.assertEqual(
+            names, ['db', 'serialize', 'render', 'view', 'total']
+        )
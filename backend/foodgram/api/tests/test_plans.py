@@ -0,0 +1,17 @@
+from django.test import TestCase
+
+from api.query_plans import explain, get_queries, seed_dataset
+
+
+class QueryPlanTest(TestCase):
+    """Горячие запросы API не читают большие таблицы полным проходом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_dataset()
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in get_queries(self.user):
+            with self.subTest(name):
+                plan, scans = explain(queryset)
+                self.assertEqual(scans, [], f'{name}:\n{plan}')
@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+
+from django.db import OperationalError
+from django.test import SimpleTestCase
+
+from foodgram.db import pool as pool_module
+from foodgram.db.pool import ConnectionPool, get_pool
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    """Пул соединений процесса на фальшивых соединениях."""
+
+    def make_pool(self, size=2, timeout=1, max_age=None):
+
+        return ConnectionPool(size, timeout, max_age)
+
+    def test_released_connection_is_reused(self):
+        pool = self.make_pool()
+        connection, created_at = pool.acquire(FakeConnection)
+        pool.release(connection, created_at)
+
+        self.assertIs(pool.acquire(FakeConnection)[0], connection)
+        self.assertEqual(pool.stats()['opened'], 1)
+        self.assertEqual(pool.stats()['reused'], 1)
+
+    def test_size_bounds_open_connections(self):
+        pool = self.make_pool(size=1, timeout=0.05)
+        pool.acquire(FakeConnection)
+
+        with self.assertRaises(OperationalError):
+            pool.acquire(FakeConnection)
+        self.assertEqual(pool.stats()['open'], 1)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_waiter_gets_released_connection(self):
+        pool = self.make_pool(size=1, timeout=5)
+        connection, created_at = pool.acquire(FakeConnection)
+        acquired = []
+        waiter = threading.Thread(
+            target=lambda: acquired.append(pool.acquire(FakeConnection)[0])
+        )
+        waiter.start()
+        time.sleep(0.05)
+        pool.release(connection, created_at)
+        waiter.join(5)
+
+        self.assertEqual(acquired, [connection])
+        self.assertEqual(pool.stats()['waited'], 1)
+
+    def test_expired_connection_is_closed(self):
+        pool = self.make_pool(max_age=0)
+        connection, created_at = pool.acquire(FakeConnection)
+        pool.release(connection, created_at)
+
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.acquire(FakeConnection)[0], connection)
+        self.assertEqual(pool.stats()['open'], 1)
+
+    def test_unusable_connection_is_replaced(self):
+        pool = self.make_pool()
+        connection, created_at = pool.acquire(FakeConnection)
+        pool.release(connection, created_at)
+
+        fresh, _ = pool.acquire(FakeConnection, check=lambda conn: False)
+        self.assertIsNot(fresh, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['open'], 1)
+
+    def test_failed_connect_frees_slot(self):
+        pool = self.make_pool(size=1)
+
+        def broken():
+            raise OperationalError('down')
+
+        with self.assertRaises(OperationalError):
+            pool.acquire(broken)
+        self.assertEqual(pool.stats()['open'], 0)
+        pool.acquire(FakeConnection)
+
+
+class GetPoolTest(SimpleTestCase):
+    """Пул алиаса меняется вместе с параметрами подключения."""
+
+    alias = 'pool_test'
+
+    def tearDown(self):
+        pool_module.pools.pop(self.alias, None)
+
+    def settings_dict(self, name):
+
+        return {'NAME': name, 'CONN_MAX_AGE': None, 'POOL': {'SIZE': 2}}
+
+    def test_new_database_name_retires_pool(self):
+        old = get_pool(self.alias, self.settings_dict('main'))
+        idle, created_at = old.acquire(FakeConnection)
+        busy = old.acquire(FakeConnection)
+        old.release(idle, created_at)
+
+        new = get_pool(self.alias, self.settings_dict('test_main'))
+
+        self.assertIsNot(new, old)
+        self.assertIs(
+            get_pool(self.alias, self.settings_dict('test_main')), new
+        )
+        self.assertTrue(idle.closed)
+        # Занятое соединение закрывается, когда его вернут.
+        old.release(*busy)
+        self.assertTrue(busy[0].closed)
+
+    def test_forked_child_does_not_reuse_parent_pools(self):
+        get_pool(self.alias, self.settings_dict('main'))
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.write(write, b'1' if self.alias in pool_module.pools else b'0')
+            os._exit(0)
+
+        os.waitpid(pid, 0)
+        os.close(write)
+        self.assertEqual(os.read(read, 1), b'0')
+        os.close(read)
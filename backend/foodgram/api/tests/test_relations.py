@@ -0,0 +1,73 @@
+from django.test import override_settings
+
+from api.tests.base import ApiTestCase
+
+RECIPES_URL = '/api/recipes/'
+
+
+@override_settings(USER_RELATIONS_CACHE_TIMEOUT=300)
+class UserRelationsTest(ApiTestCase):
+    """
+    Флаги is_favorited, is_in_shopping_cart и is_subscribed из кэша связей
+    поверх общего с анонимами кэша ответов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('user')
+        cls.other = cls.create_user('other')
+        cls.author = cls.create_user('author')
+        cls.recipe = cls.create_recipe(cls.author)
+        cls.url = f'{RECIPES_URL}{cls.recipe.pk}/'
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.user)
+
+    def flags(self, client):
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        return {
+            'is_favorited': data['is_favorited'],
+            'is_in_shopping_cart': data['is_in_shopping_cart'],
+            'is_subscribed': data['author']['is_subscribed'],
+        }
+
+    def toggle(self, method, url):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url)
+        self.assertIn(response.status_code, (201, 204))
+
+    def test_flags_follow_toggles(self):
+        urls = {
+            'is_favorited': f'{self.url}favorite/',
+            'is_in_shopping_cart': f'{self.url}shopping_cart/',
+            'is_subscribed': f'/api/users/{self.author.pk}/subscribe/',
+        }
+        expected = dict.fromkeys(urls, False)
+        self.assertEqual(self.flags(self.client), expected)
+
+        for flag, url in urls.items():
+            self.toggle('post', url)
+            expected[flag] = True
+            self.assertEqual(self.flags(self.client), expected, flag)
+
+        for flag, url in urls.items():
+            self.toggle('delete', url)
+            expected[flag] = False
+            self.assertEqual(self.flags(self.client), expected, flag)
+
+    def test_flags_do_not_leak_through_shared_cache(self):
+        self.toggle('post', f'{self.url}favorite/')
+        self.toggle('post', f'{self.url}shopping_cart/')
+        self.toggle('post', f'/api/users/{self.author.pk}/subscribe/')
+        self.assertEqual(
+            set(self.flags(self.client).values()), {True}
+        )
+
+        for client in (self.anon, self.client_for(self.other)):
+            response = client.get(self.url)
+            self.assertEqual(response['X-Response-Cache'], 'hit')
+            self.assertEqual(set(self.flags(client).values()), {False})
@@ -0,0 +1,38 @@
+from api.tests.base import ADMIN_URL, AdminTestCase, make_image
+from recipes.models import Recipe
+from recipes.renditions import FIELDS as RENDITION_FIELDS
+
+
+class AdminImageChangeTest(AdminTestCase):
+    """Новая картинка из админки заменяет копии старой."""
+
+    def renditions(self, recipe):
+        recipe = Recipe.objects.get(pk=recipe.pk)
+
+        return [getattr(recipe, field).name for field in RENDITION_FIELDS]
+
+    def test_new_image_resets_renditions(self):
+        recipe = self.add_recipe(self.author)
+        old = self.renditions(recipe)
+        self.assertTrue(all(old))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(
+                f'{ADMIN_URL}{recipe.pk}/change/',
+                self.recipe_form(
+                    self.author, image=make_image('new.png', 'blue')
+                ),
+            )
+        self.assertEqual(response.status_code, 302)
+
+        # Пока копий нет, API отдаёт новую картинку.
+        self.assertEqual(self.renditions(recipe), ['', '', ''])
+        data = self.anon.get(f'/api/recipes/{recipe.pk}/').json()
+        self.assertIn('new', data['image'])
+
+        for callback in callbacks:
+            callback()
+
+        new = self.renditions(recipe)
+        self.assertTrue(all(new))
+        self.assertFalse(set(new) & set(old))
@@ -0,0 +1,93 @@
+from api.response_cache import get_generations
+from api.tests.base import ApiTestCase
+
+RECIPES_URL = '/api/recipes/'
+USERS_URL = '/api/users/'
+
+
+class ResponseCacheTest(ApiTestCase):
+    """Кэш анонимных ответов и его сброс при записи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user('author')
+        cls.recipe = cls.create_recipe(cls.author)
+
+    def get(self, url=RECIPES_URL):
+        response = self.anon.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        return response
+
+    def authors_generation(self):
+
+        return get_generations(['authors'])[0]
+
+    def test_second_request_is_hit(self):
+        self.assertEqual(self.get()['X-Response-Cache'], 'miss')
+        self.assertEqual(self.get()['X-Response-Cache'], 'hit')
+
+    def test_recipe_edit_invalidates(self):
+        url = f'{RECIPES_URL}{self.recipe.pk}/'
+        self.get(RECIPES_URL)
+        self.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Новое имя'
+            self.recipe.save()
+
+        for response in (self.get(RECIPES_URL), self.get(url)):
+            self.assertEqual(response['X-Response-Cache'], 'miss')
+        self.assertEqual(response.json()['name'], 'Новое имя')
+
+    def test_author_profile_edit_invalidates(self):
+        url = f'{RECIPES_URL}{self.recipe.pk}/'
+        self.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.first_name = 'Renamed'
+            self.author.save()
+
+        response = self.get(url)
+        self.assertEqual(response['X-Response-Cache'], 'miss')
+        self.assertEqual(response.json()['author']['first_name'], 'Renamed')
+
+    def test_signup_keeps_cache(self):
+        generation = self.authors_generation()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.anon.post(USERS_URL, {
+                'email': 'new@example.com',
+                'username': 'new',
+                'first_name': 'New',
+                'last_name': 'User',
+                'password': 'Str0ng-passw0rd',
+            })
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.authors_generation(), generation)
+
+    def test_password_change_keeps_cache(self):
+        generation = self.authors_generation()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(self.author).post(
+                f'{USERS_URL}set_password/',
+                {
+                    'current_password': 'test-password',
+                    'new_password': 'An0ther-passw0rd',
+                },
+            )
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.authors_generation(), generation)
+
+    def test_profile_edit_without_recipes_keeps_cache(self):
+        user = self.create_user('reader')
+        generation = self.authors_generation()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.first_name = 'Renamed'
+            user.save()
+
+        self.assertEqual(self.authors_generation(), generation)
@@ -0,0 +1,102 @@
+"""
+Загрузка картинок рецептов. Кроме base64 в JSON принимается
+multipart/form-data: файл пишется во временный файл по частям,
+размер проверяется на лету, число пикселей - по заголовку картинки
+до её полного разбора.
+"""
+import io
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    FileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+from django.http.multipartparser import MultiPartParserError
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.parsers import MultiPartParser
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Прерывает разбор формы, как только файл превысил max_bytes."""
+
+    def __init__(self, request=None, max_bytes=None):
+        super().__init__(request)
+        self.max_bytes = max_bytes or settings.RECIPE_IMAGE_MAX_BYTES
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_bytes:
+            raise MultiPartParserError(
+                f'File is larger than {self.max_bytes} bytes'
+            )
+
+        return raw_data
+
+    def file_complete(self, file_size):
+
+        return None
+
+
+class RecipeMultiPartParser(MultiPartParser):
+    """
+    multipart/form-data для рецептов: файлы всегда идут во временный
+    файл, в памяти не держим. Формат полей - как у DRF для форм:
+    tags=1&tags=2, ingredients[0]id=1&ingredients[0]amount=10.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']
+        request.upload_handlers = [
+            LimitedUploadHandler(request),
+            TemporaryFileUploadHandler(request),
+        ]
+
+        return super().parse(stream, media_type, parser_context)
+
+
+class RecipeImageField(Base64ImageField):
+    """
+    Картинка рецепта строкой base64 или файлом из multipart.
+    Слишком большие файлы и картинки отклоняются до декодирования.
+    """
+
+    default_error_messages = {
+        'max_size': 'Image is larger than {max_bytes} bytes.',
+        'max_pixels': 'Image is larger than {max_pixels} pixels.',
+    }
+
+    def to_internal_value(self, data):
+        max_bytes = settings.RECIPE_IMAGE_MAX_BYTES
+        if isinstance(data, str):
+            # base64: 4 символа на каждые 3 байта.
+            if len(data.partition(';base64,')[2] or data) * 3 // 4 > max_bytes:
+                self.fail('max_size', max_bytes=max_bytes)
+
+            return super().to_internal_value(data)
+
+        if getattr(data, 'size', 0) > max_bytes:
+            self.fail('max_size', max_bytes=max_bytes)
+        self.check_pixels(data)
+
+        return serializers.ImageField.to_internal_value(self, data)
+
+    def get_file_extension(self, filename, decoded_file):
+        self.check_pixels(io.BytesIO(decoded_file))
+
+        return super().get_file_extension(filename, decoded_file)
+
+    def check_pixels(self, file):
+        """Размер по заголовку: Image.open не декодирует пиксели."""
+
+        max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+        try:
+            image = Image.open(file)
+            width, height = image.size
+        except (OSError, Image.DecompressionBombError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        finally:
+            file.seek(0)
+
+        if width * height > max_pixels:
+            self.fail('max_pixels', max_pixels=max_pixels)
@@ -2,10 +2,14 @@ from django.urls import path, include
 from rest_framework import routers
 
 from .views import (
+    DatabasePoolStats,
     DownloadShoppingCart,
     IngredientViewSet,
+    FavoriteBatchView,
     FavoriteView,
     RecipeViewSet,
+    ShoppingCartBatchView,
+    ShoppingCartCacheStats,
     ShoppingCartView,
     SubscribeView,
     SubscriptionsView,
@@ -37,16 +41,36 @@ urlpatterns = [
         ShoppingCartView.as_view(),
         name='shopping_cart',
     ),
+    path(
+        'recipes/shopping_cart/',
+        ShoppingCartBatchView.as_view(),
+        name='shopping_cart_batch',
+    ),
     path(
         'recipes/<int:recipe_id>/favorite/',
         FavoriteView.as_view(),
         name='favorite',
     ),
+    path(
+        'recipes/favorite/',
+        FavoriteBatchView.as_view(),
+        name='favorite_batch',
+    ),
     path(
         'recipes/download_shopping_cart/',
         DownloadShoppingCart.as_view(),
         name='download_shopping_cart'
     ),
+    path(
+        'recipes/download_shopping_cart/stats/',
+        ShoppingCartCacheStats.as_view(),
+        name='download_shopping_cart_stats'
+    ),
+    path(
+        'db_pool/stats/',
+        DatabasePoolStats.as_view(),
+        name='db_pool_stats'
+    ),
     path('', include(router_v1.urls)),
     path(r'auth/', include('djoser.urls.authtoken')),
 ]
@@ -1,81 +1,205 @@
-import io
-import os
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
 
-from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from rest_framework.pagination import PageNumberPagination
-
-from .serializers import IngredientWithAmountSerializer
-from recipes.models import IngredientAmount, Recipe
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
 
     page_size_query_param = 'limit'
 
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset для асинхронных вью (api.async_views)."""
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+
+        self.page.object_list = [
+            obj async for obj in self.page.object_list
+        ]
+
+        return list(self.page)
+
 
-def make_pdf(data, filename, http_status):
+class KeysetPagination(BasePagination):
     """
-    Не красиво, но хотя бы как-то выдаёт респонс файлом.
+    Курсорная (keyset) пагинация для бесконечной ленты.
+    Включается параметром ?cursor= (для первой страницы пустым).
+    Следующая страница выбирается условием по ключу сортировки
+    последней записи, без OFFSET и без COUNT(*), поэтому
+    глубокие страницы стоят столько же, сколько первая.
     """
-    pdfmetrics.registerFont(TTFont(
-        'DejaVuSansCondensed',
-        os.path.join(os.path.dirname(
-            os.path.abspath(__file__)),
-            'DejaVuSansCondensed.ttf'
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 6
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=('-pub_date', '-id')):
+        self.ordering = ordering
+
+    @classmethod
+    def is_requested(cls, request):
+
+        return cls.cursor_query_param in request.query_params
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+
+            return self.page_size
+
+        return min(max(page_size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+
+        return self.cut_page(
+            list(self.get_page_queryset(queryset, request)), page_size
         )
-    ))
-
-    all_ingredients = {}
-
-    width, height = A4
-    height -= 20
-    buffer = io.BytesIO()
-
-    pdf_file = canvas.Canvas(buffer, pagesize=A4)
-    pdf_file.setFont('DejaVuSansCondensed', 11)
-
-    pdf_file.drawString(width / 2 - 20, height, 'Мой список покупок')
-    height -= 20
-
-    for recipe_in_cart in data:
-        recipe = Recipe.objects.get(id=recipe_in_cart.pop('recipe'))
-        ingredients = IngredientWithAmountSerializer(
-            IngredientAmount.objects.filter(recipe=recipe),
-            many=True
-        ).data
-        for ingredient in ingredients:
-            name = ingredient.pop('name')
-            amount = ingredient.pop('amount')
-            unit = ingredient.pop('measurement_unit')
-            if name in all_ingredients:
-                all_ingredients[name][0] += amount
-            else:
-                all_ingredients[name] = [amount, unit]
-
-    for ingredient in all_ingredients:
-        pdf_file.drawString(
-            10,
-            height,
-            '{name} - {amount} {unit}'.format(
-                name=ingredient,
-                amount=all_ingredients[ingredient][0],
-                unit=all_ingredients[ingredient][1]
-            )
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset для асинхронных вью (api.async_views)."""
+        page_size = self.get_page_size(request)
+        results = [
+            obj async for obj in self.get_page_queryset(queryset, request)
+        ]
+
+        return self.cut_page(results, page_size)
+
+    def get_page_queryset(self, queryset, request):
+        """Записи после курсора, на одну больше размера страницы."""
+        self.request = request
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        return queryset[:self.get_page_size(request) + 1]
+
+    def cut_page(self, results, page_size):
+        self.next_position = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            self.next_position = [
+                self.get_value(results[-1], field) for field in self.ordering
+            ]
+
+        return results
+
+    def after(self, position):
+        """
+        Условие "строго после позиции" для составного ключа:
+        a <= x AND ((a < x) OR (a = x AND b < y)) для сортировки по убыванию.
+        Лишнее a <= x даёт планировщику диапазон по индексу.
+        """
+        condition = Q()
+        equal = Q()
+
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+
+        first = self.ordering[0]
+        lookup = 'lte' if first.startswith('-') else 'gte'
+
+        return Q(**{f'{first.lstrip("-")}__{lookup}': position[0]}) & condition
+
+    def get_value(self, obj, field):
+        value = getattr(obj, field.lstrip('-'))
+
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+    def decode_cursor(self, request, model):
+        """
+        Позиция из курсора, значения приведены к типам полей модели.
+        Курсор клиент может подделать, поэтому любая ошибка - 404.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+
+            return None
+
+        try:
+            position = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or (
+            len(position) != len(self.ordering)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+        try:
+            position = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+
+        return position
+
+    def encode_cursor(self, position):
+        encoded = urlsafe_b64encode(
+            json.dumps(position).encode('ascii')
+        ).decode('ascii')
+
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            encoded,
         )
-        height -= 10
-
-    pdf_file.showPage()
-    pdf_file.save()
-    buffer.seek(0)
-    response = HttpResponse(
-        content=buffer,
-        content_type='application/pdf',
-        status=http_status
-    )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    return response
+
+    def get_next_link(self):
+        if self.next_position is None:
+
+            return None
+
+        return self.encode_cursor(self.next_position)
+
+    def get_paginated_response(self, data):
+
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
@@ -1,10 +1,17 @@
 from djoser.views import UserViewSet
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Value
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, status
-from rest_framework.filters import SearchFilter
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.permissions import (
     AllowAny,
+    IsAdminUser,
     IsAuthenticatedOrReadOnly,
     IsAuthenticated,
 )
@@ -14,13 +21,19 @@ from rest_framework.mixins import (
     RetrieveModelMixin,
 )
 
-from . import filters, utils
+from . import filters, helpers, renderers, utils
+from .export_cache import bump_cart_version, export_cache, get_cart_version
+from .ingredient_index import ingredient_index
+from .relations import bump_relations, get_user_relations, overlay_recipe
+from .response_cache import RECIPE_DEPENDENCIES, AnonymousCacheMixin
+from .shopping_list import iter_shopping_list
+from .uploads import RecipeMultiPartParser
 from .serializers import (
     IngredientSerializer,
     RecipeSerializer,
     RecipeCreateSerializer,
     RecipeForSubSerializer,
-    ShoppingCartSerializer,
+    RecipeIdsSerializer,
     SubscribeSerializer,
     TagSerializer,
     CustomUserSerializer,
@@ -34,6 +47,9 @@ from recipes.models import (
     Tag,
     User,
 )
+from foodgram.db.pool import get_pool_stats
+from recipes import counters
+from recipes.search import remove_from_search_index
 
 
 class CustomUserViewSet(UserViewSet):
@@ -47,6 +63,7 @@ class CustomUserViewSet(UserViewSet):
 
 
 class TagViewSet(
+    AnonymousCacheMixin,
     ListModelMixin,
     RetrieveModelMixin,
     viewsets.GenericViewSet
@@ -61,9 +78,11 @@ class TagViewSet(
     serializer_class = TagSerializer
     permission_classes = [AllowAny,]
     pagination_class = None
+    cache_dependencies = ('tags',)
 
 
 class IngredientViewSet(
+    AnonymousCacheMixin,
     ListModelMixin,
     RetrieveModelMixin,
     viewsets.GenericViewSet
@@ -76,13 +95,34 @@ class IngredientViewSet(
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = [SearchFilter, DjangoFilterBackend]
-    filterset_class = filters.IngredientFilter
     permission_classes = [AllowAny,]
     pagination_class = None
+    cache_dependencies = ('ingredients',)
 
+    def get_cache_dependencies(self):
+        # Каталог мог поменяться в другом процессе (importcsv).
+        ingredient_index.check_catalog()
 
-class RecipeViewSet(viewsets.ModelViewSet):
+        return self.cache_dependencies
+
+    def list(self, request, *args, **kwargs):
+
+        return self.cached_response(self.search, request)
+
+    def search(self, request):
+        """
+        Список и поиск по имени идут по индексу в памяти процесса,
+        без запросов в БД. Поиск ограничен INGREDIENT_SEARCH_LIMIT.
+        """
+        name = request.query_params.get('name', '')
+        limit = settings.INGREDIENT_SEARCH_LIMIT if name else None
+        ingredients = ingredient_index.get().search(name, limit=limit)
+        serializer = self.get_serializer(ingredients, many=True)
+
+        return Response(serializer.data)
+
+
+class RecipeViewSet(AnonymousCacheMixin, viewsets.ModelViewSet):
     """
     Стандартный ModelViewSet для модели рецептов.
     Применён кастомный фильтр, правильность работы под (?).
@@ -90,10 +130,66 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
-    filter_backends = [SearchFilter, DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend]
     filterset_class = filters.RecipeFilter
     permission_classes = [IsAuthenticatedOrReadOnly,]
     pagination_class = utils.CustomPagination
+    parser_classes = [JSONParser, RecipeMultiPartParser]
+
+    @property
+    def paginator(self):
+        """
+        С параметром ?cursor= лента отдаётся курсорной пагинацией.
+        Поиск сортирует по релевантности, с ним курсор не работает.
+        """
+        if not hasattr(self, '_paginator'):
+            if (
+                utils.KeysetPagination.is_requested(self.request)
+                and not self.request.query_params.get('search')
+            ):
+                self._paginator = utils.KeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+
+        return self._paginator
+
+    def get_cache_dependencies(self):
+        if self.action == 'retrieve':
+
+            return (f'recipe:{self.kwargs["pk"]}', *RECIPE_DEPENDENCIES)
+
+        return ('recipes', *RECIPE_DEPENDENCIES)
+
+    def shares_anonymous_cache(self, request):
+        # Выборка по избранному и списку покупок у каждого своя.
+        return not (
+            {'is_favorited', 'is_in_shopping_cart'} & set(request.query_params)
+        )
+
+    def personalize(self, data, request):
+        relations = get_user_relations(request)
+        if isinstance(data, list):
+
+            return [overlay_recipe(recipe, relations) for recipe in data]
+
+        if 'results' in data:
+
+            return {
+                **data,
+                'results': [
+                    overlay_recipe(recipe, relations)
+                    for recipe in data['results']
+                ],
+            }
+
+        return overlay_recipe(data, relations)
+
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+
+            return Recipe.objects.with_related()
+
+        return Recipe.objects.all()
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
@@ -105,6 +201,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic
+    def perform_destroy(self, recipe):
+        bump_cart_version(*recipe.shopping_cart.values_list(
+            'user_id', flat=True
+        ))
+        remove_from_search_index(recipe.pk)
+        counters.change_author_counters(recipe.author_id, recipes=-1)
+        recipe.delete()
+
 
 class ShoppingCartView(APIView):
     """
@@ -126,7 +231,11 @@ class ShoppingCartView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        ShoppingCart.objects.create(user=request.user, recipe=recipe)
+        with transaction.atomic():
+            ShoppingCart.objects.create(user=request.user, recipe=recipe)
+            counters.change_recipe_counters(recipe.pk, shopping_carts=1)
+        bump_cart_version(request.user.id)
+        bump_relations(request.user.id)
 
         serializer = RecipeForSubSerializer(
             recipe,
@@ -138,15 +247,25 @@ class ShoppingCartView(APIView):
     def delete(self, request, *args, **kwargs):
         recipe = Recipe.objects.get(pk=kwargs.get('recipe_id', None))
 
-        try:
-            ShoppingCart.objects.get(recipe=recipe, user=request.user).delete()
-        except Favorite.DoesNotExist:
+        with transaction.atomic():
+            deleted, _ = ShoppingCart.objects.filter(
+                recipe=recipe, user=request.user
+            ).delete()
+            if deleted:
+                counters.change_recipe_counters(
+                    recipe.pk, shopping_carts=-1
+                )
+
+        if not deleted:
 
             return Response(
                 {'error': 'This recipe is not in your shopping cart'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        bump_cart_version(request.user.id)
+        bump_relations(request.user.id)
+
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @classmethod
@@ -174,7 +293,10 @@ class FavoriteView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        Favorite.objects.create(user=request.user, recipe=recipe)
+        with transaction.atomic():
+            Favorite.objects.create(user=request.user, recipe=recipe)
+            counters.change_recipe_counters(recipe.pk, favorites=1)
+        bump_relations(request.user.id)
 
         serializer = RecipeForSubSerializer(
             recipe, context={'request': request, 'recipe': recipe}
@@ -186,15 +308,22 @@ class FavoriteView(APIView):
         pk = kwargs.get('recipe_id', None)
         recipe = get_object_or_404(Recipe, pk=pk)
 
-        try:
-            Favorite.objects.get(recipe=recipe, user=request.user).delete()
-        except Favorite.DoesNotExist:
+        with transaction.atomic():
+            deleted, _ = Favorite.objects.filter(
+                recipe=recipe, user=request.user
+            ).delete()
+            if deleted:
+                counters.change_recipe_counters(recipe.pk, favorites=-1)
+
+        if not deleted:
 
             return Response(
                 {'error': 'You are not add this recipe in favorite before'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        bump_relations(request.user.id)
+
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @classmethod
@@ -202,6 +331,171 @@ class FavoriteView(APIView):
         return []
 
 
+class RecipeBatchView(APIView):
+    """
+    Пакетное добавление и удаление рецептов в список пользователя
+    (избранное, список покупок). Тело запроса: {"recipes": [id, ...]}.
+    Все id проверяются одним запросом, запись - одним INSERT
+    или одним DELETE. В ответе статус по каждому id, счётчики рецептов
+    меняются только по действительно записанным строкам.
+    """
+
+    permission_classes = [IsAuthenticated,]
+    model = None
+    counter = None
+
+    def get_recipes(self, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+
+        recipes = Recipe.objects.filter(pk__in=recipe_ids).annotate(
+            in_list=Exists(self.model.objects.filter(
+                user=request.user, recipe=OuterRef('pk')
+            ))
+        ).in_bulk()
+
+        return recipe_ids, recipes
+
+    def changed(self, request):
+        """Вызывается после изменения списка пользователя."""
+        bump_relations(request.user.id)
+
+    def insert(self, request, recipes):
+        """
+        Добавляет рецепты одним INSERT и возвращает добавленные.
+        Если часть пар успел добавить параллельный запрос, рецепты
+        добавляются по одному, и в ответ идут только записанные.
+        """
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create([
+                    self.model(user=request.user, recipe=recipe)
+                    for recipe in recipes
+                ])
+        except IntegrityError:
+            inserted = []
+            for recipe in recipes:
+                try:
+                    with transaction.atomic():
+                        self.model.objects.create(
+                            user=request.user, recipe=recipe
+                        )
+                except IntegrityError:
+                    continue
+
+                inserted.append(recipe)
+
+            return inserted
+
+        return recipes
+
+    def remove(self, request, recipe_ids):
+        """
+        Удаляет рецепты из списка и возвращает id удалённых.
+        Строки сначала блокируются: удалённые параллельным запросом
+        в результат не попадут.
+        """
+        rows = self.model.objects.filter(
+            user=request.user, recipe_id__in=recipe_ids
+        )
+        removed = list(
+            rows.select_for_update().values_list('recipe_id', flat=True)
+        )
+        if removed:
+            rows.filter(recipe_id__in=removed).delete()
+
+        return removed
+
+    def post(self, request, *args, **kwargs):
+        recipe_ids, recipes = self.get_recipes(request)
+        added = [
+            recipe for recipe in recipes.values() if not recipe.in_list
+        ]
+
+        if added:
+            with transaction.atomic():
+                added = self.insert(request, added)
+                counters.change_recipe_counters(
+                    *(recipe.pk for recipe in added), **{self.counter: 1}
+                )
+            if added:
+                self.changed(request)
+
+        added_ids = {recipe.pk for recipe in added}
+        results = []
+        for recipe_id in recipe_ids:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                results.append({'id': recipe_id, 'status': 'not_found'})
+            elif recipe_id not in added_ids:
+                results.append({'id': recipe_id, 'status': 'exists'})
+            else:
+                results.append({
+                    'id': recipe_id,
+                    'status': 'added',
+                    'recipe': RecipeForSubSerializer(
+                        recipe, context={'request': request}
+                    ).data,
+                })
+
+        return Response({'results': results})
+
+    def delete(self, request, *args, **kwargs):
+        recipe_ids, recipes = self.get_recipes(request)
+        removed = [
+            recipe.pk for recipe in recipes.values() if recipe.in_list
+        ]
+
+        if removed:
+            with transaction.atomic():
+                removed = self.remove(request, removed)
+                counters.change_recipe_counters(
+                    *removed, **{self.counter: -1}
+                )
+            if removed:
+                self.changed(request)
+
+        removed = set(removed)
+        results = []
+        for recipe_id in recipe_ids:
+            if recipe_id not in recipes:
+                results.append({'id': recipe_id, 'status': 'not_found'})
+            elif recipe_id in removed:
+                results.append({'id': recipe_id, 'status': 'removed'})
+            else:
+                results.append({'id': recipe_id, 'status': 'missing'})
+
+        return Response({'results': results})
+
+    @classmethod
+    def get_extra_actions(cls):
+        return []
+
+
+class ShoppingCartBatchView(RecipeBatchView):
+    """
+    Вью класс для добавления и удаления нескольких рецептов
+    в список покупок.
+    """
+
+    model = ShoppingCart
+    counter = 'shopping_carts'
+
+    def changed(self, request):
+        super().changed(request)
+        bump_cart_version(request.user.id)
+
+
+class FavoriteBatchView(RecipeBatchView):
+    """
+    Вью для добавления и удаления нескольких рецептов в избраное.
+    """
+
+    model = Favorite
+    counter = 'favorites'
+
+
 class SubscriptionsView(APIView, utils.CustomPagination):
     """
     Вью класс для просмотра подписок.
@@ -209,16 +503,43 @@ class SubscriptionsView(APIView, utils.CustomPagination):
 
     permission_classes = [IsAuthenticated,]
 
-    def get(self, request, *args, **kwargs):
-        authors = User.objects.filter(subscribe_author__user=request.user)
+    def get_queryset(self):
 
-        result_pages = self.paginate_queryset(authors, request, view=self)
+        return User.objects.filter(
+            subscribe_author__user=self.request.user
+        ).annotate(
+            recipes_count=Coalesce(F('stats__recipes_count'), 0),
+            is_subscribed=Value(True),
+        ).order_by('id')
+
+    def get_paginator(self):
+        if utils.KeysetPagination.is_requested(self.request):
+
+            return utils.KeysetPagination(ordering=('id',))
+
+        return self
+
+    def get(self, request, *args, **kwargs):
+        paginator = self.get_paginator()
+        result_pages = paginator.paginate_queryset(
+            self.get_queryset(), request, view=self
+        )
+        if result_pages is None:
+            authors = list(self.get_queryset())
+        else:
+            authors = result_pages
+        helpers.prefetch_author_recipes(
+            authors, helpers.get_recipes_limit(request)
+        )
 
         serializer = SubscribeSerializer(
-            result_pages, many=True, context={'request': request}
+            authors, many=True, context={'request': request}
         )
+        if result_pages is None:
+
+            return Response(serializer.data)
 
-        return self.get_paginated_response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
 
     @classmethod
     def get_extra_actions(cls):
@@ -247,7 +568,14 @@ class SubscribeView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        Subscription.objects.create(user=request.user, author=author)
+        with transaction.atomic():
+            Subscription.objects.create(user=request.user, author=author)
+            counters.change_author_counters(author.pk, subscribers=1)
+        bump_relations(request.user.id)
+        author.is_subscribed = True
+        helpers.prefetch_author_recipes(
+            [author], helpers.get_recipes_limit(request)
+        )
 
         serializer = SubscribeSerializer(
             author, context={'request': request, 'author': author}
@@ -259,14 +587,21 @@ class SubscribeView(APIView):
         pk = kwargs.get('user_id', None)
         author = get_object_or_404(User, pk=pk)
 
-        try:
-            Subscription.objects.get(author=author, user=request.user).delete()
-        except Subscription.DoesNotExist:
+        with transaction.atomic():
+            deleted, _ = Subscription.objects.filter(
+                author=author, user=request.user
+            ).delete()
+            if deleted:
+                counters.change_author_counters(author.pk, subscribers=-1)
+
+        if not deleted:
             return Response(
                 {'error': 'You don\'t subscribed on this user'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        bump_relations(request.user.id)
+
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @classmethod
@@ -277,24 +612,84 @@ class SubscribeView(APIView):
 class DownloadShoppingCart(APIView):
     """
     Вью класс для скачивания списка покупок.
+    Формат выбирается параметром ?format=pdf|txt|csv|json
+    (или заголовком Accept), по умолчанию pdf.
     """
 
-    permission_classes = [AllowAny,]
+    permission_classes = [IsAuthenticated,]
     pagination_class = None
+    renderer_classes = [
+        renderers.ShoppingListPDFRenderer,
+        renderers.ShoppingListTextRenderer,
+        renderers.ShoppingListCSVRenderer,
+        renderers.ShoppingListJSONRenderer,
+    ]
+
+    def get(self, request, *args, **kwargs):
+        """
+        Готовый файл берётся из кэша, пока версия корзины не изменилась.
+        Иначе список собирается одним агрегирующим запросом
+        и отдаётся потоком по мере рендера.
+        """
+        renderer = request.accepted_renderer
+        user = request.user
+        key = (user.id, get_cart_version(user.id), renderer.format)
+        content = export_cache.get(key)
+
+        if content is not None:
+            chunks = [content]
+            cache_status = 'hit'
+        else:
+            chunks = export_cache.stream_through(
+                key, renderer.stream(iter_shopping_list(user))
+            )
+            cache_status = 'miss'
 
-    def get(self, *args, **kwargs):
-        """"""
-        shopping_cart = ShoppingCart.objects.filter(user=self.request.user)
-        data = ShoppingCartSerializer(
-            shopping_cart,
-            many=True,
-            context={'request': self.request}
-        ).data
-        filename = 'shoppingcart.pdf'
-        http_status = status.HTTP_200_OK
-
-        return utils.make_pdf(
-            data=data,
-            filename=filename,
-            http_status=http_status
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
+
+        response = StreamingHttpResponse(
+            chunks,
+            content_type=content_type,
+            status=status.HTTP_200_OK
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shoppingcart.{renderer.extension}"'
         )
+        response['X-Export-Cache'] = cache_status
+
+        return response
+
+    def handle_exception(self, exc):
+        # Ошибки отдаются обычным JSON, а не в формате выгрузки.
+        self.request.accepted_renderer = JSONRenderer()
+        self.request.accepted_media_type = JSONRenderer.media_type
+
+        return super().handle_exception(exc)
+
+
+class ShoppingCartCacheStats(APIView):
+    """
+    Вью класс со счётчиками кэша списков покупок текущего процесса.
+    """
+
+    permission_classes = [IsAdminUser,]
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+
+        return Response(export_cache.stats())
+
+
+class DatabasePoolStats(APIView):
+    """
+    Вью класс со счётчиками пула соединений с БД текущего процесса.
+    """
+
+    permission_classes = [IsAdminUser,]
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+
+        return Response(get_pool_stats())
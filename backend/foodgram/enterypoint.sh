@@ -1,3 +1,9 @@
 python manage.py collectstatic --noinput
 python manage.py migrate
-gunicorn foodgram.wsgi:application --bind 0:8000
+# SERVER_MODE=asgi - uvicorn воркеры и асинхронные чтения API.
+if [ "$SERVER_MODE" = "asgi" ]; then
+    gunicorn foodgram.asgi:application --bind 0:8000 \
+        --worker-class uvicorn.workers.UvicornWorker
+else
+    gunicorn foodgram.wsgi:application --bind 0:8000
+fi
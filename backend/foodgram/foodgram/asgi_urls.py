@@ -0,0 +1,8 @@
+from django.contrib import admin
+from django.urls import path, include
+
+# Корневые адреса для ASGI: чтения API идут в асинхронные вью.
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('api/', include('api.async_urls', namespace='api')),
+]
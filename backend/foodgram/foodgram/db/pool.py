@@ -0,0 +1,280 @@
+"""
+Пул соединений с БД на процесс. Соединение, которое Django закрывает
+в конце запроса, возвращается в пул, и следующий запрос - из любого
+потока, в том числе из потоков ASGI - берёт его без нового подключения.
+Открытых соединений не больше SIZE, при нехватке запрос ждёт TIMEOUT
+секунд. Соединения старше CONN_MAX_AGE закрываются, при
+CONN_HEALTH_CHECKS соединение из пула проверяется перед выдачей.
+
+Пул привязан к алиасу и параметрам подключения: если они поменялись
+(тесты подменяют NAME), старый пул закрывается. После fork пулы
+родителя в дочернем процессе не используются.
+"""
+import os
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from django.db import OperationalError
+
+pools = {}
+pools_lock = threading.Lock()
+# Пулы родителя в дочернем процессе: их сокеты нельзя ни использовать,
+# ни закрывать (закрытие завершило бы и сессию родителя).
+inherited_pools = []
+
+CONNECTION_PARAMS = ('NAME', 'HOST', 'PORT', 'USER')
+
+
+class ConnectionPool:
+
+    def __init__(self, size, timeout, max_age, params=None):
+        self.size = size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.params = params
+        self.retired = False
+        self.idle = deque()
+        self.open = 0
+        self.condition = threading.Condition()
+        self.counters = dict.fromkeys(
+            ('opened', 'reused', 'waited', 'timeouts', 'discarded'), 0
+        )
+        self.wait_time = 0.0
+
+    def expired(self, created_at):
+
+        return (
+            self.max_age is not None
+            and time.monotonic() - created_at >= self.max_age
+        )
+
+    def take_idle(self):
+        """Самое свежее соединение из пула, устаревшие закрываются."""
+
+        while self.idle:
+            connection, created_at = self.idle.pop()
+            if not self.expired(created_at):
+
+                return connection, created_at
+
+            self.forget(connection)
+
+        return None
+
+    def acquire(self, connect, check=None):
+        """
+        Соединение из пула или новое через connect(), с временем его
+        создания. check(connection) проверяет соединение из пула.
+        """
+
+        started = None
+        while True:
+            with self.condition:
+                pooled = self.take_idle()
+                if pooled is None:
+                    if self.open < self.size:
+                        self.open += 1
+                        self.add_wait(started)
+                        break
+
+                    if started is None:
+                        started = time.monotonic()
+                        self.counters['waited'] += 1
+                    remaining = started + self.timeout - time.monotonic()
+                    if remaining <= 0:
+                        self.counters['timeouts'] += 1
+                        self.add_wait(started)
+                        raise OperationalError(
+                            f'No free database connection in {self.timeout}'
+                            f' seconds, pool size is {self.size}.'
+                        )
+
+                    self.condition.wait(remaining)
+                    continue
+
+            if check is None or check(pooled[0]):
+                with self.condition:
+                    self.counters['reused'] += 1
+                    self.add_wait(started)
+
+                return pooled
+
+            self.discard(pooled[0])
+
+        try:
+            connection = connect()
+        except Exception:
+            with self.condition:
+                self.open -= 1
+                self.condition.notify()
+            raise
+
+        with self.condition:
+            self.counters['opened'] += 1
+
+        return connection, time.monotonic()
+
+    def add_wait(self, started):
+        if started is not None:
+            self.wait_time += time.monotonic() - started
+
+    def release(self, connection, created_at):
+        """Вернуть исправное соединение в пул."""
+
+        if self.retired or self.expired(created_at):
+            self.discard(connection)
+
+            return
+
+        with self.condition:
+            self.idle.append((connection, created_at))
+            self.condition.notify()
+
+    def discard(self, connection):
+        """Закрыть соединение и освободить его место в пуле."""
+
+        with self.condition:
+            self.forget(connection)
+
+    def forget(self, connection):
+        """Закрывает соединение, вызывается под self.condition."""
+
+        self.open -= 1
+        self.counters['discarded'] += 1
+        self.condition.notify()
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close_idle(self):
+        """Закрывает свободные соединения."""
+
+        with self.condition:
+            while self.idle:
+                self.forget(self.idle.pop()[0])
+
+    def retire(self):
+        """Пул больше не выдаёт соединений, возвращённые закрываются."""
+
+        self.retired = True
+        self.close_idle()
+
+    def stats(self):
+        with self.condition:
+
+            return {
+                'size': self.size,
+                'open': self.open,
+                'idle': len(self.idle),
+                **self.counters,
+                'wait_time': round(self.wait_time, 6),
+            }
+
+
+def get_pool(alias, settings_dict):
+    params = tuple(settings_dict.get(name) for name in CONNECTION_PARAMS)
+    with pools_lock:
+        pool = pools.get(alias)
+        if pool is not None and pool.params != params:
+            # Соединения к прежней базе не годятся.
+            pool.retire()
+            pool = None
+
+        if pool is None:
+            options = settings_dict.get('POOL', {})
+            pools[alias] = ConnectionPool(
+                options.get('SIZE', 10),
+                options.get('TIMEOUT', 10),
+                settings_dict['CONN_MAX_AGE'],
+                params,
+            )
+
+        return pools[alias]
+
+
+def get_pool_stats():
+    """Счётчики пулов текущего процесса по алиасам БД."""
+
+    with pools_lock:
+        items = list(pools.items())
+
+    return {alias: pool.stats() for alias, pool in items}
+
+
+def close_idle_connections():
+    """
+    Закрывает свободные соединения пулов процесса: перед fork, чтобы
+    дочерние процессы не унаследовали открытые сокеты, и перед
+    CREATE/DROP DATABASE, которым мешают открытые соединения.
+    """
+
+    with pools_lock:
+        items = list(pools.values())
+
+    for pool in items:
+        pool.close_idle()
+
+
+def forget_inherited_pools():
+    """После fork дочерний процесс начинает с пустыми пулами."""
+
+    global pools_lock
+
+    pools_lock = threading.Lock()
+    inherited_pools.extend(pools.values())
+    pools.clear()
+
+
+os.register_at_fork(after_in_child=forget_inherited_pools)
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Берёт соединения DatabaseWrapper из пула процесса и возвращает их
+    туда вместо закрытия. Бэкенд определяет connection_is_idle
+    (соединение вне транзакции и открыто) и connection_is_usable.
+    """
+
+    pooled_from = None
+    pooled_since = None
+
+    @property
+    def pool(self):
+
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        check = None
+        if self.settings_dict['CONN_HEALTH_CHECKS']:
+            check = self.connection_is_usable
+        pool = self.pool
+        connection, self.pooled_since = pool.acquire(
+            partial(super().get_new_connection, conn_params), check
+        )
+        # Возвращаем туда же, даже если пул алиаса успеют заменить.
+        self.pooled_from = pool
+
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+
+            return
+
+        if (
+            self.in_atomic_block
+            or self.errors_occurred
+            or not self.connection_is_idle(self.connection)
+        ):
+            self.pooled_from.discard(self.connection)
+        else:
+            self.pooled_from.release(self.connection, self.pooled_since)
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # Между запросами соединение лежит в пуле, а не в потоке.
+        if self.connection is not None and not self.in_atomic_block:
+            self.close()
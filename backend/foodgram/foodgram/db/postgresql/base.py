@@ -0,0 +1,27 @@
+"""PostgreSQL с пулом соединений процесса (foodgram.db.pool)."""
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from ..pool import PooledDatabaseWrapperMixin
+from .creation import DatabaseCreation
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def connection_is_idle(self, connection):
+
+        return not connection.closed and (
+            connection.info.transaction_status
+            == extensions.TRANSACTION_STATUS_IDLE
+        )
+
+    def connection_is_usable(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except base.Database.Error:
+
+            return False
+
+        return True
@@ -0,0 +1,18 @@
+from django.db.backends.postgresql import creation
+
+from ..pool import close_idle_connections
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """
+    PostgreSQL не создаёт копию базы и не удаляет её, пока к ней есть
+    соединения, поэтому свободные соединения пула закрываются заранее.
+    """
+
+    def _execute_create_test_db(self, cursor, parameters, keepdb=False):
+        close_idle_connections()
+        super()._execute_create_test_db(cursor, parameters, keepdb)
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_idle_connections()
+        super()._destroy_test_db(test_database_name, verbosity)
@@ -39,6 +39,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.performance.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,7 +49,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'foodgram.urls'
+# foodgram.asgi подставляет foodgram.asgi_urls с асинхронными чтениями.
+ROOT_URLCONF = os.getenv('DJANGO_ROOT_URLCONF', default='foodgram.urls')
 
 TEMPLATES = [
     {
@@ -68,6 +70,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+# Сколько секунд живёт соединение с БД, пусто или None - без ограничения.
+DB_CONN_MAX_AGE = os.getenv('DB_CONN_MAX_AGE', default='60')
+
 DATABASES = {
     'default': {
         'ENGINE': os.getenv(
@@ -79,8 +84,103 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRE_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='db'),
         'PORT': os.getenv('DB_PORT', default=5432),
+        'CONN_MAX_AGE': (
+            None if DB_CONN_MAX_AGE in ('', 'None') else int(DB_CONN_MAX_AGE)
+        ),
+        'CONN_HEALTH_CHECKS': True,
+        # Пул соединений процесса (foodgram.db.pool): сколько соединений
+        # открыто максимум и сколько секунд ждать свободного.
+        'POOL': {
+            'SIZE': int(os.getenv('DB_POOL_SIZE', default=10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', default=10)),
+        },
     }
 }
+# Для PostgreSQL соединения берутся из пула, DB_POOL_SIZE=0 - без пула.
+if (
+    DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'
+    and DATABASES['default']['POOL']['SIZE']
+):
+    DATABASES['default']['ENGINE'] = 'foodgram.db.postgresql'
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+# Версии и поколения в кэше сбрасывают данные во всех процессах, поэтому
+# locmem годится только для одного процесса (см. api.checks), а в
+# docker-compose кэш - Redis. По умолчанию locmem держит 300 ключей,
+# и вытеснение ключа версии сбрасывало бы кэшированные данные.
+if CACHES['default']['BACKEND'].endswith('.LocMemCache'):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', default=100_000)),
+    }
+
+# Объём памяти процесса под готовые файлы списка покупок.
+SHOPPING_LIST_CACHE_MAX_BYTES = int(
+    os.getenv('SHOPPING_LIST_CACHE_MAX_BYTES', default=32 * 1024 * 1024)
+)
+
+# Сколько ингредиентов отдаёт автодополнение /api/ingredients/?name=
+INGREDIENT_SEARCH_LIMIT = int(
+    os.getenv('INGREDIENT_SEARCH_LIMIT', default=50)
+)
+# Раз во сколько секунд процесс сверяет индекс ингредиентов с БД:
+# каталог мог поменять другой процесс, 0 - не сверять.
+INGREDIENT_INDEX_CHECK_INTERVAL = int(
+    os.getenv('INGREDIENT_INDEX_CHECK_INTERVAL', default=60)
+)
+
+# Копии картинок рецептов (recipes.renditions): в фоновых потоках
+# или сразу после коммита, если фоновая обработка выключена.
+IMAGE_RENDITIONS_ASYNC = os.getenv(
+    'IMAGE_RENDITIONS_ASYNC', default='True'
+) == 'True'
+IMAGE_RENDITION_WORKERS = int(
+    os.getenv('IMAGE_RENDITION_WORKERS', default=2)
+)
+
+# Сколько живут закэшированные ответы для анонимов (api.response_cache).
+# Устаревшие ответы сбрасываются поколениями, TTL - лишь верхняя граница.
+RESPONSE_CACHE_TIMEOUT = int(
+    os.getenv('RESPONSE_CACHE_TIMEOUT', default=10 * 60)
+)
+
+# Сколько живут в кэше наборы избранного, списка покупок и подписок
+# пользователя (api.relations). 0 - загружать на каждый запрос.
+USER_RELATIONS_CACHE_TIMEOUT = int(
+    os.getenv('USER_RELATIONS_CACHE_TIMEOUT', default=5 * 60)
+)
+
+# Замеры запросов (api.performance): заголовок Server-Timing и лог
+# запросов дольше SLOW_REQUEST_MS миллисекунд, 0 - не писать лог.
+SERVER_TIMING = os.getenv('SERVER_TIMING', default='True') == 'True'
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', default=500))
+
+# Кэш пользователей по токену (api.authentication): в памяти процесса
+# до TOKEN_CACHE_SIZE токенов на TOKEN_CACHE_LOCAL_TIMEOUT секунд - это
+# и задержка выхода в других процессах, в общем кэше (Redis, Memcached)
+# - на TOKEN_CACHE_TIMEOUT секунд. С кэшем в памяти процесса (LocMem)
+# общий уровень не используется.
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', default=10_000))
+TOKEN_CACHE_LOCAL_TIMEOUT = int(
+    os.getenv('TOKEN_CACHE_LOCAL_TIMEOUT', default=10)
+)
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', default=5 * 60))
+
+# Ограничения на картинку рецепта (api.uploads): размер файла
+# и число пикселей, проверяются до декодирования картинки.
+RECIPE_IMAGE_MAX_BYTES = int(
+    os.getenv('RECIPE_IMAGE_MAX_BYTES', default=10 * 1024 * 1024)
+)
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.getenv('RECIPE_IMAGE_MAX_PIXELS', default=40_000_000)
+)
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -136,10 +236,15 @@ REST_FRAMEWORK = {
     # 'PAGE_SIZE': 1,
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
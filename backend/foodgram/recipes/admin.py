@@ -1,5 +1,13 @@
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Count
+from django.utils.functional import cached_property
 
+from api.export_cache import bump_cart_version
+from api.response_cache import bump_recipes
+from . import counters
 from .models import (
     Ingredient,
     IngredientAmount,
@@ -9,6 +17,117 @@ from .models import (
     Subscription,
     Tag,
 )
+from .renditions import FIELDS as RENDITION_FIELDS, schedule_renditions
+from .search import remove_from_search_index, update_search_index
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц: без фильтров и поиска на PostgreSQL
+    берёт оценку числа строк из pg_class вместо COUNT(*).
+    Маленькие таблицы и отфильтрованные списки считаются точно.
+    """
+
+    exact_count_below = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+
+            if row and row[0] >= self.exact_count_below:
+
+                return int(row[0])
+
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Общие настройки для таблиц, которые растут вместе с пользователями:
+    оценочный счётчик строк и без второго COUNT(*) при поиске.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class LoadedAutocompleteSelect(AutocompleteSelect):
+    """
+    Автодополнение, которое не запрашивает выбранный объект,
+    если он уже загружен вместе со строкой (select_related).
+    """
+
+    selected_object = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = self.selected_object
+        if selected is None or [str(v) for v in value] != [str(selected.pk)]:
+
+            return super().optgroups(name, value, attr)
+
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+
+        options.append(self.create_option(
+            name,
+            selected.pk,
+            self.choices.field.label_from_instance(selected),
+            {str(selected.pk)},
+            len(options),
+        ))
+
+        return [(None, options, 0)]
+
+
+class IngredientAmountInline(admin.TabularInline):
+    """
+    Ингредиенты рецепта: автодополнение вместо списка всех ингредиентов,
+    сами ингредиенты подгружаются одним запросом вместе со строками.
+    """
+
+    model = IngredientAmount
+    extra = 0
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+
+        return super().get_queryset(request).select_related('ingredient')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'ingredient':
+            kwargs['widget'] = LoadedAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get('using')
+            )
+
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+
+        class LoadedIngredientFormSet(formset):
+
+            def _construct_form(self, i, **kwargs):
+                form = super()._construct_form(i, **kwargs)
+                instance = form.instance
+                if IngredientAmount.ingredient.is_cached(instance):
+                    widget = form.fields['ingredient'].widget
+                    getattr(widget, 'widget', widget).selected_object = (
+                        instance.ingredient
+                    )
+
+                return form
+
+        return LoadedIngredientFormSet
 
 
 @admin.register(Tag)
@@ -16,83 +135,152 @@ class TagAdmin(admin.ModelAdmin):
     """Admin model for tag model."""
 
     list_display = ('id', 'name', 'color', 'slug',)
+    search_fields = ('name', 'slug',)
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(LargeTableAdmin):
     """
     Описание в админки модели ингредиента.
     """
 
     list_display = ('id', 'name', 'measurement_unit',)
+    search_fields = ('name',)
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     """
     Описание в админки модели рецепта.
+    Счётчики избранного и списков покупок хранятся в самом рецепте,
+    поиск без join по тэгам (тэги - в фильтре). Создание, смена автора
+    и удаление меняют recipes_count авторов, как в API.
     """
 
     list_display = (
         'id',
         'author',
         'name',
-        'image',
-        'text',
         'cooking_time',
+        'pub_date',
         'favorite_count',
         'shoppingcart_count',
     )
+    list_select_related = ('author',)
+    list_filter = ('tags',)
     search_fields = (
         'name',
         'author__username',
-        'author__first_name',
-        'author__last_name',
-        'tags__name',
-        'tags__slug',
+        'author__email',
     )
+    autocomplete_fields = ('author',)
+    filter_horizontal = ('tags',)
     readonly_fields = ('favorite_count', 'shoppingcart_count')
+    inlines = (IngredientAmountInline,)
 
+    @admin.display(ordering='favorites_count')
     def favorite_count(self, obj):
 
-        return obj.favorite.count()
+        return obj.favorites_count
 
+    @admin.display(ordering='shopping_carts_count')
     def shoppingcart_count(self, obj):
 
-        return obj.shopping_cart.count()
+        return obj.shopping_carts_count
+
+    def save_model(self, request, obj, form, change):
+        if 'image' in form.changed_data:
+            # Копии старой картинки больше не подходят.
+            for field in RENDITION_FIELDS:
+                setattr(obj, field, '')
+        super().save_model(request, obj, form, change)
+        if not change:
+            counters.change_author_counters(obj.author_id, recipes=1)
+        elif 'author' in form.changed_data:
+            counters.change_author_counters(
+                form.initial['author'], recipes=-1
+            )
+            counters.change_author_counters(obj.author_id, recipes=1)
+        if 'image' in form.changed_data:
+            schedule_renditions(obj.pk)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            self.forget_recipes(Recipe.objects.filter(pk=obj.pk))
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            self.forget_recipes(queryset)
+            super().delete_queryset(request, queryset)
+
+    def forget_recipes(self, recipes):
+        """
+        То же, что при удалении рецепта через API: счётчики авторов,
+        версии списков покупок и поисковый индекс.
+        """
+        bump_cart_version(*ShoppingCart.objects.filter(
+            recipe__in=recipes
+        ).values_list('user_id', flat=True).distinct())
+        remove_from_search_index(*recipes.values_list('pk', flat=True))
+        by_author = recipes.order_by().values('author_id').annotate(
+            total=Count('pk')
+        )
+        for row in by_author:
+            counters.change_author_counters(
+                row['author_id'], recipes=-row['total']
+            )
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        recipe = form.instance
+        bump_recipes(recipe.pk)
+        update_search_index(recipe.pk)
+        # Ингредиенты могли поменяться - готовые списки покупок устарели.
+        bump_cart_version(*recipe.shopping_cart.values_list(
+            'user_id', flat=True
+        ))
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
     """
     Описание в админки модели списка покупок.
     """
 
     list_display = ('user', 'recipe',)
+    list_select_related = ('user', 'recipe',)
+    raw_id_fields = ('user', 'recipe',)
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     """
     Описание в админки модели избранного.
     """
 
     list_display = ('user', 'recipe',)
+    list_select_related = ('user', 'recipe',)
+    raw_id_fields = ('user', 'recipe',)
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(LargeTableAdmin):
     """
     Описание в админки модели подписок.
     """
 
     list_display = ('user', 'author',)
+    list_select_related = ('user', 'author',)
+    raw_id_fields = ('user', 'author',)
 
 
 @admin.register(IngredientAmount)
-class IngredientAmountAdmin(admin.ModelAdmin):
+class IngredientAmountAdmin(LargeTableAdmin):
     """
     Описание в админки промежуточной модели для ингредиентов.
     """
 
     list_display = ('recipe', 'ingredient', 'amount',)
+    list_select_related = ('recipe', 'ingredient',)
+    raw_id_fields = ('recipe', 'ingredient',)
@@ -0,0 +1,127 @@
+"""
+Денормализованные счётчики: избранное и списки покупок у рецепта,
+рецепты и подписчики у автора (AuthorStats).
+Меняются атомарным UPDATE ... SET x = x + n, без чтения строки.
+API и админка меняют счётчики вместе с данными. Если они разъехались
+(loaddata, правки в БД в обход Django, удаление пользователей),
+их пересчитывает команда recountstats.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import (
+    AuthorStats,
+    Favorite,
+    Recipe,
+    ShoppingCart,
+    Subscription,
+    User,
+)
+
+
+def increments(**deltas):
+    """{'x': 1} -> {'x': max(x + 1, 0)} для update()."""
+
+    return {
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+        if delta
+    }
+
+
+def change_recipe_counters(*recipe_ids, favorites=0, shopping_carts=0):
+    Recipe.objects.filter(pk__in=recipe_ids).update(**increments(
+        favorites_count=favorites,
+        shopping_carts_count=shopping_carts,
+    ))
+
+
+def change_author_counters(user_id, recipes=0, subscribers=0):
+    values = increments(
+        recipes_count=recipes,
+        subscribers_count=subscribers,
+    )
+    if AuthorStats.objects.filter(user_id=user_id).update(**values):
+
+        return
+
+    try:
+        with transaction.atomic():
+            AuthorStats.objects.create(
+                user_id=user_id,
+                recipes_count=max(recipes, 0),
+                subscribers_count=max(subscribers, 0),
+            )
+    except IntegrityError:
+        # Строку успел создать параллельный запрос.
+        AuthorStats.objects.filter(user_id=user_id).update(**values)
+
+
+def count_of(model, field, outer='pk'):
+    """Подзапрос COUNT(*) строк model, ссылающихся на внешнюю строку."""
+
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef(outer)}).order_by()
+            .values(field).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def wrong_rows(queryset, counts):
+    """Сколько строк, где сохранённый счётчик не равен настоящему."""
+
+    condition = Q()
+    for field, expression in counts.items():
+        queryset = queryset.annotate(**{f'actual_{field}': expression})
+        condition |= ~Q(**{field: F(f'actual_{field}')})
+
+    return queryset.filter(condition).count()
+
+
+def recount(dry_run=False):
+    """
+    Пересчитывает все счётчики пакетными UPDATE с подзапросами.
+    Возвращает, сколько строк рецептов и авторов было неверно.
+    """
+
+    recipe_counts = {
+        'favorites_count': count_of(Favorite, 'recipe'),
+        'shopping_carts_count': count_of(ShoppingCart, 'recipe'),
+    }
+    author_counts = {
+        'recipes_count': count_of(Recipe, 'author', outer='user_id'),
+        'subscribers_count': count_of(
+            Subscription, 'author', outer='user_id'
+        ),
+    }
+
+    with transaction.atomic():
+        AuthorStats.objects.bulk_create(
+            (
+                AuthorStats(user_id=user_id)
+                for user_id in User.objects.filter(
+                    stats__isnull=True
+                ).values_list('pk', flat=True).iterator()
+            ),
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+        wrong = {
+            'recipes': wrong_rows(Recipe.objects.all(), recipe_counts),
+            'authors': wrong_rows(AuthorStats.objects.all(), author_counts),
+        }
+
+        if dry_run:
+            transaction.set_rollback(True)
+
+            return wrong
+
+        Recipe.objects.update(**recipe_counts)
+        AuthorStats.objects.update(**author_counts)
+
+        return wrong
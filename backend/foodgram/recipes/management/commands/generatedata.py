@@ -0,0 +1,132 @@
+"""Synthetic dataset generator for load tests."""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from recipes.models import Ingredient
+from recipes.synthetic import PASSWORD, generate
+
+
+class Command(BaseCommand):
+    """Generate users, recipes and relations with skewed distributions."""
+
+    help = (
+        'Generate synthetic users, recipes (tags, ingredients from the'
+        + ' catalog, placeholder images), favorites, shopping carts and'
+        + ' subscriptions with power-law distributions. Load the catalog'
+        + ' with importcsv first. The same --seed on the same database'
+        + ' gives the same data for any --processes; use another --seed'
+        + ' to add more data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=1000,
+            help='Ingredients to create if the catalog is empty.',
+        )
+        parser.add_argument(
+            '--favorites',
+            type=int,
+            default=20,
+            help='Mean favorites per user.',
+        )
+        parser.add_argument(
+            '--carts',
+            type=int,
+            default=5,
+            help='Mean shopping cart recipes per user.',
+        )
+        parser.add_argument(
+            '--subscriptions',
+            type=int,
+            default=10,
+            help='Mean subscriptions per user.',
+        )
+        parser.add_argument(
+            '--exponent',
+            type=float,
+            default=1.1,
+            help='Power-law exponent: weight of the n-th item is 1/n^s.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=1,
+            help='Worker processes (PostgreSQL only).',
+        )
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=8,
+            help='Distinct placeholder images shared by recipes.',
+        )
+        parser.add_argument(
+            '--skip-search',
+            action='store_true',
+            help='Do not fill the search index (run rebuildsearch later).',
+        )
+
+    def handle(self, *args, **options):
+        """Filler."""
+        if options['users'] < 1:
+            raise CommandError('Need at least one user.')
+
+        if options['tags'] < 1:
+            raise CommandError('Need at least one tag.')
+
+        processes = options['processes']
+        if processes > 1 and connection.vendor == 'sqlite':
+            self.stderr.write(
+                'SQLite allows a single writer, using one process.'
+            )
+            processes = 1
+
+        if not Ingredient.objects.exists():
+            self.stderr.write(
+                'The ingredient catalog is empty, creating synthetic'
+                f' ingredients ({options["ingredients"]}).'
+            )
+
+        start = time.perf_counter()
+        data = generate(
+            users=options['users'],
+            recipes=options['recipes'],
+            ingredients=options['ingredients'],
+            tags=options['tags'],
+            favorites=options['favorites'],
+            carts=options['carts'],
+            subscriptions=options['subscriptions'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            processes=processes,
+            images=options['images'],
+            search=not options['skip_search'],
+            exponent=options['exponent'],
+            progress=self.progress if options['verbosity'] > 1 else None,
+        )
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            'users: {users}, recipes: {recipes}, tags: {tags},'
+            ' relations: {relations} in {elapsed:.2f}s'
+            ' ({rate:.0f} recipes/s); password: {password}'.format(
+                users=len(data['users']),
+                recipes=len(data['recipes']),
+                tags=len(data['tags']),
+                relations=data['relations'],
+                elapsed=elapsed,
+                rate=len(data['recipes']) / elapsed if elapsed else 0,
+                password=PASSWORD,
+            )
+        )
+
+    def progress(self, stage, done):
+        self.stdout.write(f'{stage}: {done}')
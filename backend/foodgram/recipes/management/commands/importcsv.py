@@ -1,31 +1,181 @@
-"""Filler."""
-from json import load
-from django.core.management.base import BaseCommand
+"""Bulk ingredient catalog loader."""
+import csv
+import json
+import os
+import time
 
-from recipes.models import (
-    Ingredient
-)
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ingredient_index import bump_index_version
+from api.response_cache import bump_generations
+from recipes.models import Ingredient
+
+
+def read_csv(file):
+    """Строки csv файла с заголовком name,measurement_unit."""
+    yield from csv.DictReader(file)
+
+
+def read_json(file, chunk_size=64 * 1024):
+    """
+    Объекты из JSON массива (или JSON Lines) по одному,
+    без загрузки всего файла в память.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,[]')
+        if not buffer:
+            if eof:
+
+                return
+
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+
+        try:
+            row, end = decoder.raw_decode(buffer)
+        except ValueError:
+            if eof:
+                raise CommandError(f'Broken JSON near: {buffer[:50]!r}')
+
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+
+        buffer = buffer[end:]
+        yield row
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+    '.jsonl': read_json,
+}
 
 
 class Command(BaseCommand):
-    """Importing csv file in local db."""
+    """Import ingredients from csv or json in batches."""
 
     help = (
-        'Import list of files from static/data/:'
-        + 'category.csv, comment.csv, genre.csv, genre_title.csv, review.csv,'
-        + ' title.csv and user.csv'
+        'Import ingredients from data/ingredients.json (or --path to a'
+        + ' csv/json file) with batched inserts. Existing ingredients'
+        + ' (same name and measurement unit) are skipped. Running servers'
+        + ' see the new catalog at once with a shared cache, otherwise'
+        + ' within INGREDIENT_INDEX_CHECK_INTERVAL seconds.'
     )
 
-    def handle(self, *args, **option):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=os.path.join(
+                settings.BASE_DIR, 'data', 'ingredients.json'
+            ),
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be inserted, write nothing.',
+        )
+
+    def handle(self, *args, **options):
         """Filler."""
-        print("Loading DB data")
-        dictin = load(open('./data/ingredients.json', encoding='utf-8'))
+        path = options['path']
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError(f'Unsupported file type: {path}')
+
+        self.dry_run = options['dry_run']
+        self.stats = {'inserted': 0, 'skipped': 0, 'invalid': 0}
+        self.seen = set()
+        start = time.perf_counter()
+
+        with open(path, encoding='utf-8') as file:
+            batch = []
+            for row in reader(file):
+                key = self.clean(row)
+                if key is None:
+                    continue
 
-        for row in dictin:
-            Ingredient.objects.get_or_create(
-                name=row['name'],
-                measurement_unit=row['measurement_unit'],
+                batch.append(key)
+                if len(batch) >= options['batch_size']:
+                    self.load(batch)
+                    batch = []
+
+            if batch:
+                self.load(batch)
+
+        if self.stats['inserted'] and not self.dry_run:
+            # Доходит до серверов только через общий кэш, с кэшем в
+            # памяти процесса они сверяют каталог с БД сами.
+            bump_index_version()
+            bump_generations('ingredients')
+
+        elapsed = time.perf_counter() - start
+        total = sum(self.stats.values())
+        self.stdout.write(
+            '{mode}inserted: {inserted}, skipped: {skipped},'
+            ' invalid: {invalid}; {total} rows in {elapsed:.2f}s'
+            ' ({rate:.0f} rows/s)'.format(
+                mode='[dry run] would be ' if self.dry_run else '',
+                total=total,
+                elapsed=elapsed,
+                rate=total / elapsed if elapsed else 0,
+                **self.stats,
+            )
+        )
+
+    def clean(self, row):
+        """(name, measurement_unit) или None для кривых строк и повторов."""
+        try:
+            key = (
+                ' '.join(row['name'].split()),
+                ' '.join((row.get('measurement_unit') or '').split()),
             )
+        except (AttributeError, KeyError, TypeError):
+            self.stats['invalid'] += 1
+
+            return None
+
+        if not key[0] or len(key[0]) > 200 or len(key[1]) > 200:
+            self.stats['invalid'] += 1
+
+            return None
+
+        if key in self.seen:
+            self.stats['skipped'] += 1
+
+            return None
+
+        self.seen.add(key)
+
+        return key
+
+    def load(self, batch):
+        existing = set(Ingredient.objects.filter(
+            name__in={name for name, _ in batch}
+        ).values_list('name', 'measurement_unit'))
+        new = [key for key in batch if key not in existing]
+        self.stats['skipped'] += len(batch) - len(new)
+        self.stats['inserted'] += len(new)
+
+        if self.dry_run:
+            for name, unit in new:
+                self.stdout.write(f'+ {name} ({unit})')
+
+            return
 
-        print('Ingredients done..')
-        print('DB filled')
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in new
+            ),
+            ignore_conflicts=True,
+        )
@@ -0,0 +1,41 @@
+"""Make resized copies of recipe images."""
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from recipes.models import Recipe
+from recipes.renditions import make_renditions
+
+
+class Command(BaseCommand):
+    """Backfill renditions for images uploaded before they existed."""
+
+    help = 'Make card, thumbnail and full copies of recipe images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Rebuild copies for every recipe, not only missing ones.',
+        )
+
+    def handle(self, *args, **options):
+        """Filler."""
+        queryset = Recipe.objects.exclude(image='')
+        if not options['all']:
+            queryset = queryset.filter(
+                Q(image_full='') | Q(image_card='') | Q(image_thumbnail='')
+            )
+        recipe_ids = list(
+            queryset.order_by('pk').values_list('pk', flat=True)
+        )
+
+        done = failed = 0
+        for recipe_id in recipe_ids:
+            try:
+                if make_renditions(recipe_id):
+                    done += 1
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'Recipe {recipe_id}: {error}')
+
+        self.stdout.write(f'Renditions made: {done}, failed: {failed}')
@@ -0,0 +1,26 @@
+"""Rebuild recipe full-text search documents."""
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.search import update_search_index
+
+
+class Command(BaseCommand):
+    """Rebuild search documents, e.g. after renaming tags or ingredients."""
+
+    help = 'Rebuild full-text search documents for all recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        """Filler."""
+        batch_size = options['batch_size']
+        recipe_ids = list(
+            Recipe.objects.order_by('pk').values_list('pk', flat=True)
+        )
+
+        for start in range(0, len(recipe_ids), batch_size):
+            update_search_index(*recipe_ids[start:start + batch_size])
+
+        self.stdout.write(f'Search documents rebuilt: {len(recipe_ids)}')
@@ -0,0 +1,34 @@
+"""Recompute denormalized counters."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.counters import recount
+
+
+class Command(BaseCommand):
+    """Recompute favorites/cart counters of recipes and author stats."""
+
+    help = (
+        'Recompute favorites_count, shopping_carts_count of recipes and'
+        + ' recipes_count, subscribers_count of authors.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows are out of sync.',
+        )
+
+    def handle(self, *args, **options):
+        """Filler."""
+        start = time.perf_counter()
+        result = recount(dry_run=options['dry_run'])
+        action = 'Out of sync' if options['dry_run'] else 'Repaired'
+
+        self.stdout.write(
+            f'{action}: {result["recipes"]} recipes,'
+            f' {result["authors"]} authors'
+            f' ({time.perf_counter() - start:.2f}s)'
+        )
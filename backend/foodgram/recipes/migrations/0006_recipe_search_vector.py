@@ -0,0 +1,90 @@
+# Generated by Django 4.1.4 on 2026-10-18 17:31
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+POSTGRESQL_FORWARD = """
+UPDATE recipes_recipe r SET search_vector =
+    setweight(to_tsvector('russian', translate(r.name, 'Ёё', 'Ее')), 'A')
+    || setweight(to_tsvector('russian', translate(coalesce((
+        SELECT string_agg(t.name, ' ') FROM recipes_tag t
+        JOIN recipes_recipe_tags rt ON rt.tag_id = t.id
+        WHERE rt.recipe_id = r.id
+    ), ''), 'Ёё', 'Ее')), 'B')
+    || setweight(to_tsvector('russian', translate(coalesce((
+        SELECT string_agg(i.name, ' ') FROM recipes_ingredient i
+        JOIN recipes_ingredientamount ia ON ia.ingredient_id = i.id
+        WHERE ia.recipe_id = r.id
+    ), ''), 'Ёё', 'Ее')), 'B')
+    || setweight(to_tsvector('russian', translate(r.text, 'Ёё', 'Ее')), 'C');
+CREATE INDEX recipes_recipe_search_gin
+    ON recipes_recipe USING gin (search_vector);
+"""
+
+POSTGRESQL_BACKWARD = 'DROP INDEX IF EXISTS recipes_recipe_search_gin;'
+
+SQLITE_FORWARD = (
+    """
+    CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5(
+        name, tags, ingredients, text,
+        tokenize = 'unicode61 remove_diacritics 2'
+    );
+    """,
+    """
+    INSERT INTO recipes_recipe_fts (rowid, name, tags, ingredients, text)
+    SELECT
+        r.id,
+        replace(replace(r.name, 'ё', 'е'), 'Ё', 'Е'),
+        replace(replace(coalesce((
+            SELECT group_concat(t.name, ' ') FROM recipes_tag t
+            JOIN recipes_recipe_tags rt ON rt.tag_id = t.id
+            WHERE rt.recipe_id = r.id
+        ), ''), 'ё', 'е'), 'Ё', 'Е'),
+        replace(replace(coalesce((
+            SELECT group_concat(i.name, ' ') FROM recipes_ingredient i
+            JOIN recipes_ingredientamount ia ON ia.ingredient_id = i.id
+            WHERE ia.recipe_id = r.id
+        ), ''), 'ё', 'е'), 'Ё', 'Е'),
+        replace(replace(r.text, 'ё', 'е'), 'Ё', 'Е')
+    FROM recipes_recipe r;
+    """,
+)
+
+SQLITE_BACKWARD = ('DROP TABLE IF EXISTS recipes_recipe_fts;',)
+
+
+def create_search_structures(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRESQL_FORWARD)
+    elif vendor == 'sqlite':
+        for statement in SQLITE_FORWARD:
+            schema_editor.execute(statement)
+
+
+def drop_search_structures(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRESQL_BACKWARD)
+    elif vendor == 'sqlite':
+        for statement in SQLITE_BACKWARD:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_alter_recipe_pub_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            create_search_structures,
+            drop_search_structures,
+        ),
+    ]
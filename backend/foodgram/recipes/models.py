@@ -1,10 +1,14 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import (
     MaxValueValidator,
     MinValueValidator,
     RegexValidator,
 )
 from django.db import models
+from django.db.models import F, Prefetch, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 
 User = get_user_model()
 
@@ -30,6 +34,10 @@ class Tag(models.Model):
         unique=True,
     )
 
+    def __str__(self):
+
+        return self.name
+
 
 class Ingredient(models.Model):
     """
@@ -46,6 +54,59 @@ class Ingredient(models.Model):
         max_length=200,
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_unit'
+            )
+        ]
+
+    def __str__(self):
+
+        return f'{self.name}, {self.measurement_unit}'
+
+
+class RecipeQuerySet(models.QuerySet):
+    """
+    Запросы для рецептов с заранее спланированной загрузкой связей,
+    чтобы выдача списка не делала отдельных запросов на каждый рецепт.
+    """
+
+    def with_related(self):
+        """Автор одним JOIN, тэги и ингредиенты - по одному запросу."""
+
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient_amount',
+                queryset=IngredientAmount.objects.select_related(
+                    'ingredient'
+                ),
+            ),
+        )
+
+    def latest_per_author(self, author_ids, limit):
+        """
+        Не больше limit последних рецептов каждого из авторов одним
+        запросом: ROW_NUMBER() OVER (PARTITION BY author_id ...).
+        """
+
+        ranked = Recipe.objects.filter(author_id__in=author_ids).annotate(
+            recipe_rank=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            )
+        ).order_by().values('id', 'recipe_rank')
+        sql, params = ranked.query.sql_with_params()
+
+        return self.filter(pk__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            'WHERE ranked.recipe_rank <= %s',
+            (*params, limit),
+        ))
+
 
 class Recipe(models.Model):
     """
@@ -54,7 +115,8 @@ class Recipe(models.Model):
     ingredients(throught_model) = ingredient_amount
     Favorite = favorite
     ShoppingCart = shopping_cart
-
+    Счётчики favorites_count и shopping_carts_count
+    обновляются в recipes.counters.
     """
 
     tags = models.ManyToManyField(
@@ -77,6 +139,23 @@ class Recipe(models.Model):
     image = models.ImageField(
         upload_to='recipes/images/',
     )
+    # Уменьшенные копии image, их готовит recipes.renditions
+    # в фоне после сохранения рецепта. Пока копии нет - отдаётся image.
+    image_full = models.ImageField(
+        upload_to='recipes/images/renditions/',
+        blank=True,
+        editable=False,
+    )
+    image_card = models.ImageField(
+        upload_to='recipes/images/renditions/',
+        blank=True,
+        editable=False,
+    )
+    image_thumbnail = models.ImageField(
+        upload_to='recipes/images/renditions/',
+        blank=True,
+        editable=False,
+    )
     text = models.TextField()
     cooking_time = models.IntegerField(
         validators=[
@@ -88,9 +167,44 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        'Добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        'Добавлений в список покупок',
+        default=0,
+        editable=False,
+    )
+
+    # Поисковый вектор для PostgreSQL, см. recipes.search.
+    # GIN индекс создаётся миграцией только на PostgreSQL.
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            # Лента и курсорная пагинация сортируют по (pub_date, id).
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx',
+            ),
+            # Рецепты автора в ленте и последние рецепты в подписках.
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
+
+    def __str__(self):
+
+        return self.name
 
 
 class ShoppingCart(models.Model):
@@ -168,6 +282,30 @@ class Subscription(models.Model):
         ]
 
 
+class AuthorStats(models.Model):
+    """
+    Счётчики пользователя как автора: рецепты и подписчики.
+    Хранятся отдельно, потому что модель User стандартная.
+    Related names:
+    User = stats
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    recipes_count = models.PositiveIntegerField(
+        'Рецептов',
+        default=0,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+    )
+
+
 class IngredientAmount(models.Model):
     """
     Промежуточная модель для ManyToMany связи модели рецептов
@@ -191,3 +329,12 @@ class IngredientAmount(models.Model):
             MaxValueValidator(999),
         ],
     )
+
+    class Meta:
+        indexes = [
+            # Покрывающий индекс для суммирования списка покупок.
+            models.Index(
+                fields=['recipe', 'ingredient', 'amount'],
+                name='ingredient_amount_recipe_idx',
+            ),
+        ]
@@ -0,0 +1,139 @@
+"""
+Уменьшенные копии картинки рецепта: full, card и thumbnail.
+Готовятся вне запроса - в пуле потоков после коммита транзакции,
+лежат рядом с оригиналом в recipes/images/renditions/.
+Для уже загруженных картинок копии делает команда makerenditions.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from api.response_cache import bump_recipes
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# Имя копии: (поле модели, размер, формат, обрезать до размера).
+RENDITIONS = {
+    'full': ('image_full', (1600, 1600), 'JPEG', False),
+    'card': ('image_card', (600, 600), 'WEBP', False),
+    'thumbnail': ('image_thumbnail', (160, 160), 'WEBP', True),
+}
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'WEBP': {'quality': 80, 'method': 4},
+}
+FIELDS = [field for field, _, _, _ in RENDITIONS.values()]
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_RENDITION_WORKERS,
+    thread_name_prefix='renditions',
+)
+
+
+def rendition_url(recipe, name):
+    """URL копии или оригинала, если копия ещё не готова."""
+
+    field = getattr(recipe, RENDITIONS[name][0])
+
+    return field.url if field else recipe.image.url
+
+
+def encode(image, size, image_format, crop):
+    if crop:
+        # Квадрат по центру, маленькие картинки не растягиваем.
+        side = min(*size, *image.size)
+        image = ImageOps.fit(image, (side, side), Image.LANCZOS)
+    else:
+        image = image.copy()
+        image.thumbnail(size, Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, image_format, **SAVE_OPTIONS[image_format])
+
+    return buffer.getvalue()
+
+
+def open_image(field):
+    with field.open('rb') as file:
+        image = Image.open(file)
+        # Для JPEG декодер сразу уменьшает картинку кратно 1/2..1/8.
+        image.draft('RGB', RENDITIONS['full'][1])
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert(
+                'RGBA' if 'transparency' in image.info else 'RGB'
+            )
+        image.load()
+
+    return image
+
+
+def make_renditions(recipe_id):
+    """
+    Пересобирает все копии картинки рецепта. Записывает их, только
+    если за это время картинку не заменили, старые копии удаляет.
+    """
+
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', *FIELDS
+    ).first()
+    if recipe is None or not recipe.image:
+
+        return False
+
+    image = open_image(recipe.image)
+    base = os.path.splitext(os.path.basename(recipe.image.name))[0]
+    old_files = [getattr(recipe, field) for field in FIELDS]
+    new_files = {}
+    for name, (field, size, image_format, crop) in RENDITIONS.items():
+        storage = recipe.image.storage
+        path = storage.save(
+            Recipe._meta.get_field(field).generate_filename(
+                recipe, f'{base}_{name}.{EXTENSIONS[image_format]}'
+            ),
+            ContentFile(encode(image, size, image_format, crop)),
+        )
+        new_files[field] = path
+
+    updated = Recipe.objects.filter(
+        pk=recipe.pk, image=recipe.image.name
+    ).update(**new_files)
+    if updated:
+        bump_recipes(recipe.pk)
+    stale = old_files if updated else new_files.values()
+    for file in stale:
+        name = getattr(file, 'name', file)
+        if name:
+            recipe.image.storage.delete(name)
+
+    return bool(updated)
+
+
+def run(recipe_id):
+    try:
+        make_renditions(recipe_id)
+    except Exception:
+        logger.exception('Не удалось сделать копии картинки %s', recipe_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_renditions(recipe_id):
+    """Копии делаются после коммита, в фоне или сразу (см. настройки)."""
+
+    def submit():
+        if settings.IMAGE_RENDITIONS_ASYNC:
+            executor.submit(run, recipe_id)
+        else:
+            make_renditions(recipe_id)
+
+    transaction.on_commit(submit)
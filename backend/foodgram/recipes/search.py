@@ -0,0 +1,143 @@
+"""
+Полнотекстовый поиск по рецептам.
+
+Документ рецепта - название, тэги, ингредиенты и текст.
+PostgreSQL: колонка Recipe.search_vector (tsvector) с GIN индексом.
+SQLite: теневая таблица FTS5 recipes_recipe_fts (rowid = id рецепта).
+Обе структуры создаются миграцией 0006 и обновляются
+update_search_index при записи рецепта.
+"""
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db import connection
+from django.db.models import F, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Recipe
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+
+# Веса частей документа: название важнее тэгов и ингредиентов,
+# те важнее текста. Для bm25 порядок колонок как в FTS_TABLE.
+WEIGHTS = (
+    ('name', 'A', 10.0),
+    ('tags', 'B', 5.0),
+    ('ingredients', 'B', 5.0),
+    ('text', 'C', 1.0),
+)
+
+
+def normalize(value):
+    return value.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def get_documents(recipe_ids):
+    """Части документа для поиска по каждому рецепту."""
+
+    recipes = Recipe.objects.filter(pk__in=recipe_ids).prefetch_related(
+        'tags', 'ingredients'
+    )
+
+    for recipe in recipes:
+        yield recipe.pk, {
+            'name': normalize(recipe.name),
+            'tags': normalize(' '.join(tag.name for tag in recipe.tags.all())),
+            'ingredients': normalize(' '.join(
+                ingredient.name for ingredient in recipe.ingredients.all()
+            )),
+            'text': normalize(recipe.text),
+        }
+
+
+def update_search_index(*recipe_ids):
+    """Пересобирает поисковые документы рецептов."""
+
+    vendor = connection.vendor
+
+    for recipe_id, document in get_documents(recipe_ids):
+        if vendor == 'postgresql':
+            vectors = [
+                SearchVector(
+                    Value(document[part]), weight=weight, config=SEARCH_CONFIG
+                )
+                for part, weight, _ in WEIGHTS
+            ]
+            vector = vectors[0]
+            for other in vectors[1:]:
+                vector += other
+            Recipe.objects.filter(pk=recipe_id).update(search_vector=vector)
+
+        elif vendor == 'sqlite':
+            columns = ', '.join(part for part, _, _ in WEIGHTS)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, {columns}) '
+                    f'VALUES (%s{", %s" * len(WEIGHTS)})',
+                    [recipe_id] + [document[part] for part, _, _ in WEIGHTS],
+                )
+
+
+def remove_from_search_index(*recipe_ids):
+    """В PostgreSQL вектор удаляется вместе с рецептом, в SQLite - руками."""
+
+    if connection.vendor == 'sqlite' and recipe_ids:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN '
+                f'({", ".join(["%s"] * len(recipe_ids))})',
+                list(recipe_ids),
+            )
+
+
+def to_fts_query(value):
+    """Слова запроса как префиксы для FTS5, все обязательны."""
+
+    words = re.findall(r'\w+', normalize(value).lower())
+
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_recipes(queryset, value):
+    """
+    Оставляет рецепты, подходящие под запрос, и сортирует по релевантности
+    (аннотация search_rank, больше - лучше).
+    """
+
+    vendor = connection.vendor
+
+    if vendor == 'postgresql':
+        query = SearchQuery(
+            normalize(value), search_type='websearch', config=SEARCH_CONFIG
+        )
+
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query),
+        ).order_by('-search_rank', '-pub_date')
+
+    if vendor == 'sqlite':
+        match = to_fts_query(value)
+        if not match:
+
+            return queryset
+
+        bm25_weights = ', '.join(str(weight) for _, _, weight in WEIGHTS)
+        table = Recipe._meta.db_table
+
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (match,),
+        )).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, {bm25_weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {table}.id',
+            (match,),
+        )).order_by('-search_rank', '-pub_date')
+
+    return queryset.filter(
+        Q(name__icontains=value) | Q(text__icontains=value)
+    )
@@ -0,0 +1,349 @@
+"""
+Синтетические данные: пользователи, тэги, рецепты с тэгами
+и ингредиентами из каталога, избранное, списки покупок и подписки.
+
+Распределения степенные, как в жизни: у немногих авторов большая часть
+рецептов и подписчиков, немногие рецепты собирают большую часть
+избранного, а соль встречается чаще шафрана. При одном и том же seed
+данные одинаковы при любом числе процессов: рецепты и связи
+делаются порциями, у каждой порции свой генератор случайных чисел,
+а id рецептов выдаются заранее.
+
+Строки пишутся пакетными bulk_create, в обход сигналов, поэтому
+в конце пересчитываются счётчики, поисковые документы и сдвигаются
+поколения кэша ответов.
+"""
+import io
+import random
+from itertools import accumulate
+from multiprocessing import get_context
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, connections
+from PIL import Image
+
+from api.ingredient_index import bump_index_version
+from api.response_cache import bump_generations
+from foodgram.db.pool import close_idle_connections
+from .counters import recount
+from .models import (
+    Favorite,
+    Ingredient,
+    IngredientAmount,
+    Recipe,
+    ShoppingCart,
+    Subscription,
+    Tag,
+    User,
+)
+from .search import update_search_index
+
+PASSWORD = 'synthetic-password'
+PLACEHOLDER_IMAGE = 'recipes/images/synthetic_{index}.png'
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+WORDS = (
+    'суп', 'салат', 'пирог', 'каша', 'омлет', 'рагу', 'запеканка',
+    'борщ', 'плов', 'блины', 'котлеты', 'соус', 'десерт', 'паста',
+    'быстрый', 'домашний', 'летний', 'острый', 'сладкий', 'овощной',
+    'куриный', 'рыбный', 'грибной', 'сырный', 'бабушкин', 'постный',
+)
+CHUNK_SIZE = 5000
+
+# Состояние генерации для порций, в процессах-воркерах - копия
+# родительского (процессы запускаются через fork).
+state = None
+
+
+def placeholder_images(count):
+    """Маленькие картинки разных цветов, общие для всех рецептов."""
+
+    names = []
+    for index in range(count):
+        name = PLACEHOLDER_IMAGE.format(index=index)
+        if not default_storage.exists(name):
+            buffer = io.BytesIO()
+            color = random.Random(index).randrange(1 << 24)
+            Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+        names.append(name)
+
+    return names
+
+
+def phrase(rng, length):
+
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+
+def power_law(population, exponent, rng):
+    """
+    (элементы в случайном порядке, накопленные веса) для choices:
+    вес элемента с рангом r - 1 / r ** exponent.
+    """
+
+    population = list(population)
+    rng.shuffle(population)
+
+    return population, list(accumulate(
+        1 / rank ** exponent for rank in range(1, len(population) + 1)
+    ))
+
+
+def pick(rng, skewed, count, exclude=None):
+    """count разных элементов по степенному распределению skewed."""
+
+    population, cum_weights = skewed
+    count = min(count, len(population) - (exclude is not None))
+    chosen = set()
+    for _ in range(10):
+        if len(chosen) >= count:
+            break
+        chosen.update(rng.choices(
+            population, cum_weights=cum_weights, k=count - len(chosen)
+        ))
+        chosen.discard(exclude)
+
+    return sorted(chosen)[:count]
+
+
+def activity(rng, mean, limit):
+    """Число связей пользователя: Парето со средним около mean."""
+
+    if not mean:
+
+        return 0
+
+    # Среднее paretovariate(1.5) - 3.
+    return min(limit, int(rng.paretovariate(1.5) * mean / 3))
+
+
+def chunks(start, stop, size=CHUNK_SIZE):
+
+    return [
+        (first, min(first + size, stop)) for first in range(start, stop, size)
+    ]
+
+
+def make_recipes(bounds):
+    """Рецепты с id из [start, stop) с тэгами и ингредиентами."""
+
+    start, stop = bounds
+    rng = random.Random(f'{state["seed"]}:recipes:{start}')
+    batch_size = state['batch_size']
+    recipes = []
+    tags = []
+    amounts = []
+    for recipe_id in range(start, stop):
+        recipes.append(Recipe(
+            pk=recipe_id,
+            author_id=pick(rng, state['authors'], 1)[0],
+            name=phrase(rng, 3).capitalize(),
+            image=rng.choice(state['images']),
+            text=phrase(rng, rng.randint(10, 60)).capitalize(),
+            cooking_time=rng.randint(5, 180),
+        ))
+        tags.extend(
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for tag_id in pick(rng, state['tags'], rng.randint(1, 3))
+        )
+        amounts.extend(
+            IngredientAmount(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=rng.randint(1, 999),
+            )
+            for ingredient_id in pick(
+                rng, state['ingredients'], rng.randint(3, 12)
+            )
+        )
+
+    Recipe.objects.bulk_create(recipes, batch_size=batch_size)
+    Recipe.tags.through.objects.bulk_create(tags, batch_size=batch_size)
+    IngredientAmount.objects.bulk_create(amounts, batch_size=batch_size)
+    if state['search']:
+        update_search_index(*range(start, stop))
+
+    return stop - start
+
+
+def make_relations(user_ids):
+    """Избранное, списки покупок и подписки пользователей."""
+
+    rng = random.Random(f'{state["seed"]}:relations:{user_ids[0]}')
+    batch_size = state['batch_size']
+    limit = state['max_relations']
+    rows = {Favorite: [], ShoppingCart: [], Subscription: []}
+    for user_id in user_ids:
+        rows[Favorite].extend(
+            Favorite(user_id=user_id, recipe_id=recipe_id)
+            for recipe_id in pick(rng, state['recipes'], activity(
+                rng, state['favorites'], limit
+            ))
+        )
+        rows[ShoppingCart].extend(
+            ShoppingCart(user_id=user_id, recipe_id=recipe_id)
+            for recipe_id in pick(rng, state['recipes'], activity(
+                rng, state['carts'], limit
+            ))
+        )
+        rows[Subscription].extend(
+            Subscription(user_id=user_id, author_id=author_id)
+            for author_id in pick(rng, state['authors'], activity(
+                rng, state['subscriptions'], limit
+            ), exclude=user_id)
+        )
+
+    for model, objects in rows.items():
+        model.objects.bulk_create(
+            objects, batch_size=batch_size, ignore_conflicts=True
+        )
+
+    return sum(len(objects) for objects in rows.values())
+
+
+def run_chunks(function, items, processes, progress=None):
+    """function для каждой порции, в processes процессах."""
+
+    if processes <= 1:
+        results = map(function, items)
+    else:
+        # Дочерние процессы открывают свои соединения с БД.
+        connections.close_all()
+        close_idle_connections()
+        pool = get_context('fork').Pool(processes)
+        results = pool.imap_unordered(function, items)
+
+    total = 0
+    try:
+        for done in results:
+            total += done
+            if progress:
+                progress(total)
+    finally:
+        if processes > 1:
+            pool.close()
+            pool.join()
+
+    return total
+
+
+def generate(
+    users=50, recipes=500, ingredients=1000, tags=10,
+    favorites=20, carts=10, subscriptions=5, seed=0,
+    batch_size=1000, processes=1, images=8, search=True,
+    exponent=1.1, progress=None,
+):
+    """
+    Создаёт данные и возвращает словарь: users, tags (slug),
+    ingredients, recipes - списки id, relations - число созданных связей
+    (избранное, покупки, подписки). favorites, carts и subscriptions -
+    среднее число связей пользователя. Ингредиенты берутся из каталога,
+    если он пуст - создаются ingredients штук. progress(stage, done)
+    вызывается по мере готовности порций.
+    """
+
+    global state
+    rng = random.Random(seed)
+
+    ingredient_ids = list(
+        Ingredient.objects.order_by('pk').values_list('pk', flat=True)
+    )
+    if not ingredient_ids:
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(
+                    name=f'{phrase(rng, 2)} {index}',
+                    measurement_unit=rng.choice(UNITS),
+                )
+                for index in range(ingredients)
+            ),
+            batch_size=batch_size,
+        )
+        ingredient_ids = list(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        bump_index_version()
+
+    tag_objects = Tag.objects.bulk_create(
+        Tag(
+            name=f'тэг {index}',
+            color='#{:06X}'.format(rng.randrange(1 << 24)),
+            slug=f'synthetic-{seed}-{index}',
+        )
+        for index in range(tags)
+    )
+
+    password = make_password(PASSWORD)
+    user_ids = []
+    for start, stop in chunks(0, users):
+        user_ids.extend(user.pk for user in User.objects.bulk_create(
+            (
+                User(
+                    username=f'synthetic_{seed}_{index}',
+                    email=f'synthetic_{seed}_{index}@example.com',
+                    first_name=phrase(rng, 1).title(),
+                    last_name=phrase(rng, 1).title(),
+                    password=password,
+                )
+                for index in range(start, stop)
+            ),
+            batch_size=batch_size,
+        ))
+        if progress:
+            progress('users', len(user_ids))
+
+    first_recipe = (
+        Recipe.objects.order_by('-pk').values_list('pk', flat=True).first()
+        or 0
+    ) + 1
+    recipe_ids = range(first_recipe, first_recipe + recipes)
+    state = {
+        'seed': seed,
+        'batch_size': batch_size,
+        'search': search,
+        'images': placeholder_images(images),
+        'authors': power_law(user_ids, exponent, rng),
+        'tags': power_law([tag.pk for tag in tag_objects], exponent, rng),
+        'ingredients': power_law(ingredient_ids, exponent, rng),
+        'recipes': power_law(recipe_ids, exponent, rng),
+        'favorites': favorites,
+        'carts': carts,
+        'subscriptions': subscriptions,
+        'max_relations': max(recipes // 10, 1),
+    }
+    try:
+        run_chunks(
+            make_recipes,
+            chunks(recipe_ids.start, recipe_ids.stop),
+            processes,
+            progress and (lambda done: progress('recipes', done)),
+        )
+        relations = run_chunks(
+            make_relations,
+            [
+                user_ids[start:stop]
+                for start, stop in chunks(0, len(user_ids), CHUNK_SIZE // 10)
+            ],
+            processes,
+            progress and (lambda done: progress('relations', done)),
+        )
+    finally:
+        state = None
+
+    # id рецептов заданы явно - сдвигаем последовательность.
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [Recipe]):
+            cursor.execute(sql)
+    recount()
+    bump_generations('recipes', 'tags', 'ingredients', 'authors')
+
+    return {
+        'users': user_ids,
+        'tags': [tag.slug for tag in tag_objects],
+        'ingredients': ingredient_ids,
+        'recipes': list(recipe_ids),
+        'relations': relations,
+    }